@@ -19,6 +19,8 @@ transform between device and data coordinates.
 
 """
 
+import contextlib
+import math
 import sys
 
 import numpy as np
@@ -26,8 +28,12 @@ import scipy.optimize as opt
 
 import cairocffi as cairo
 
+from . import color
 from . import device
 from . import param
+from . import path
+from . import raster
+from . import spatial
 from . import util
 
 
@@ -78,6 +84,10 @@ class Axes(device.Device):
         self.offset = (x_offset, y_offset)
         self.scale = (x_scale, y_scale)
 
+        # points recorded for pick(), in device coordinates
+        self._picks = []
+        self._pick_index = None
+
     def decorate(self, *, style=None):
         """Draw the axes border rectangle.
 
@@ -212,13 +222,67 @@ class Axes(device.Device):
         """
         return self.offset[1] + y_data * self.scale[1]
 
-    def draw_lines(self, x, y=None, *, style=None):
+    def _transform(self, x, y):
+        """Convert arrays of data coordinates to device coordinates.
+
+        Either argument can be ``None``, in which case ``None`` is
+        returned in its place.
+
+        """
+        if x is not None:
+            x = self.offset[0] + self.scale[0] * np.asarray(x, dtype=np.float64)
+        if y is not None:
+            y = self.offset[1] + self.scale[1] * np.asarray(y, dtype=np.float64)
+        return x, y
+
+    def _path_coords(self, x, y, data_coords):
+        """Get the coordinates to use for path construction.
+
+        If `data_coords` is true, the data coordinates are used as
+        they are, and the paths must be added using
+        :py:meth:`_append_paths` with ``data_coords=True``.  Otherwise
+        the coordinates are converted to device coordinates.
+
+        """
+        if data_coords:
+            return x, y
+        return self._transform(x, y)
+
+    def _append_paths(self, paths, data_coords=False):
+        """Add path data to the current path of the drawing context.
+
+        If `data_coords` is true, the paths are given in data
+        coordinates and Cairo converts them to device coordinates
+        while the path is constructed.  The previous transformation
+        matrix is restored afterwards, so that line widths and point
+        sizes are still interpreted in device units.  If `data_coords`
+        is a :py:class:`cairocffi.Matrix`, this matrix is used instead
+        of the transformation from data to device coordinates.
+
+        """
+        if data_coords:
+            m = self.ctx.get_matrix()
+            if not isinstance(data_coords, cairo.Matrix):
+                data_coords = cairo.Matrix(self.scale[0], 0, 0, self.scale[1],
+                                           self.offset[0], self.offset[1])
+            self.ctx.transform(data_coords)
+        for data in paths:
+            path.append(self.ctx, data)
+        if data_coords:
+            self.ctx.set_matrix(m)
+
+    def draw_lines(self, x, y=None, *, col=None, rasterize=None, style=None):
         """Draw polygonal line segments.
 
         The given vertices are connected by a chain of line segments.
         Vertices where at least one of the coordinates is ``nan`` are
         ignored and the line is interupted where such vertices occur.
 
+        Several lines can be drawn in one call, by giving `y` either
+        as a two-dimensional array with one line per row, or as a list
+        of one-dimensional arrays.  All lines are drawn together, with
+        one stroke per line color.
+
         Args:
             x (array with ``shape=(n,)`` or ``shape=(n,2)``): The
                 vertex coordinates of the line segments.  If `y` is
@@ -226,42 +290,213 @@ class Axes(device.Device):
                 are ``(x[0], y[0])``, ..., ``(x[n-1], y[n-1])``.
                 Otherwise, `x` must be two-dimensional with two
                 columns and the vertices are ``x[0,:]``, ...,
-                ``x[n-1,:]``.
-            y (array with ``shape=(n,)``, optional): See the
-                description of `x`.
+                ``x[n-1,:]``.  If `y` describes several lines, `x`
+                can either be shared between all lines, or can have
+                the same shape as `y`.
+            y (array with ``shape=(n,)`` or ``shape=(m,n)``, or list of
+                arrays, optional): See the description of `x`.
+            col (optional): Individual colors for the lines, either
+                as a list with one color per line, or as an array of
+                RGB or RGBA values (see
+                :py:func:`jvplot.color.get_array`).  If this is not
+                set, the ``plot_col`` graphics parameter is used.
+            rasterize (bool, optional): Whether to draw the lines as an
+                image, see :py:meth:`raster_layer`.  If this is not
+                given, the lines are rasterized if the number of
+                vertices exceeds the graphics parameter
+                ``raster_threshold``.
             style (dict): graphics parameter values to override the
                 canvas settings, setting the line thickness and color.
 
         """
         style = param.check_keys(style)
+        x, y, offsets = util._check_series(x, y)
+        self._draw_series(x, y, offsets, col, style, rasterize)
+
+    def _draw_series(self, x, y, offsets, col, style, rasterize=None):
         lw = self._get_param('plot_lw', style)
-        col = self._get_param('plot_col', style)
+        data_coords = self._get_param('plot_data_coords', style)
 
-        x, y = util._check_coords(x, y)
-        x = self.offset[0] + self.scale[0] * x
-        y = self.offset[1] + self.scale[1] * y
+        self._record_picks(x, y, style)
+        x, y = self._path_coords(x, y, data_coords)
+
+        with self._auto_raster_layer(rasterize, len(x), style):
+            if col is None:
+                col = self._get_param('plot_col', style)
+                self._stroke_paths([path.lines(x, y, offsets)], lw, col,
+                                   data_coords)
+                return
+
+            m = len(offsets) - 1
+            for c, idx in color.groups(color.get_array(col, m)):
+                data = path.lines(*_select_pieces(x, y, offsets, idx))
+                self._stroke_paths([data], lw, c, data_coords)
+
+    def draw_polylines(self, coords, offsets, *, col=None, rasterize=None,
+                       style=None):
+        """Draw a collection of polygonal lines.
+
+        The lines are given as one array containing the vertices of
+        all lines, together with an array of offsets which indicates
+        where each line starts.  All lines are drawn together, with
+        one stroke per line color.
+
+        Args:
+            coords (array with ``shape=(n, 2)``): The vertex coordinates
+                of all lines.
+            offsets (integer array with ``shape=(m+1,)``): Line `k`
+                consists of the vertices ``coords[offsets[k]:offsets[k+1]]``.
+                The first element must be 0 and the last element must
+                be `n`.
+            col (optional): Individual colors for the lines, see
+                :py:meth:`draw_lines`.
+            rasterize (bool, optional): Whether to draw the lines as an
+                image, see :py:meth:`draw_lines`.
+            style (dict): graphics parameter values to override the
+                canvas settings, setting the line thickness and color.
+
+        """
+        style = param.check_keys(style)
+        x, y, offsets = _check_ragged(coords, offsets)
+        self._draw_series(x, y, offsets, col, style, rasterize)
+
+    def draw_polygons(self, coords, offsets, *, bg_col=None, rasterize=None,
+                      style=None):
+        """Draw a collection of filled polygons.
+
+        The arguments `coords` and `offsets` are as for
+        :py:meth:`draw_polylines`.  Every polygon is closed
+        automatically.  Polygons of the same fill color are drawn
+        together, and the colors are drawn in the order in which they
+        first occur.  Where polygons of different colors overlap, the
+        stacking order is therefore not necessarily the order of the
+        polygons.
+
+        Args:
+            coords (array with ``shape=(n, 2)``): The vertex coordinates
+                of all polygons.
+            offsets (integer array with ``shape=(m+1,)``): The positions
+                in `coords` where the polygons start, followed by `n`.
+            bg_col (optional): Individual fill colors for the
+                polygons, either as a list with one color per polygon,
+                or as an array of RGB or RGBA values (see
+                :py:func:`jvplot.color.get_array`).  If this is not set,
+                the ``polygon_bg`` graphics parameter is used.
+            rasterize (bool, optional): Whether to draw the polygons as
+                an image, see :py:meth:`draw_lines`.
+            style (dict): graphics parameter values to override the
+                canvas settings.
+
+        """
+        style = param.check_keys(style)
+        fg = self._get_param('polygon_fg', style)
+        lw = self._get_param('polygon_lw', style)
+        data_coords = self._get_param('plot_data_coords', style)
+        if bg_col is None:
+            bg_col = [self._get_param('polygon_bg', style)]
+
+        x, y, offsets = _check_ragged(coords, offsets)
+        x, y = self._path_coords(x, y, data_coords)
+        m = len(offsets) - 1
+
+        with self._auto_raster_layer(rasterize, len(x), style):
+            self.ctx.save()
+            for c, idx in color.groups(color.get_array(bg_col, m)):
+                if c[3] <= 0:
+                    continue
+                data = path.polygons(*_select_pieces(x, y, offsets, idx))
+                self._append_paths([data], data_coords)
+                self.ctx.set_source_rgba(*c)
+                self.ctx.fill()
+            self.ctx.restore()
+
+            self._stroke_paths([path.polygons(x, y, offsets)], lw, fg,
+                               data_coords)
+
+    @contextlib.contextmanager
+    def raster_layer(self, *, style=None):
+        """Draw plot elements into an image, instead of as vector graphics.
+
+        This is a context manager.  While it is active, all drawing
+        operations on the axes are performed on an image covering the
+        axes area, and the image is placed on the page when the
+        context manager exits.  This keeps files in vector formats
+        like PDF small and fast to display when a plot contains a
+        very large number of points or lines, while axes, ticks and
+        labels remain vector graphics::
+
+            with ax.raster_layer():
+                ax.draw_points(x, y)
+                ax.draw_lines(x, y)
+
+        The resolution of the image is given by the graphics parameter
+        ``raster_res``, where 0 means 300 pixels per inch.  If all
+        output files of the plot are raster images, the context
+        manager has no effect.
 
+        Args:
+            style (dict): graphics parameter values to override the
+                canvas settings.
+
+        """
+        style = param.check_keys(style)
+        if self._pixel_res is not None:
+            yield
+            return
+
+        x, y, w, h = self.rect
+        res = self._raster_res(style)
+        k = res / self.res
+        pix_w = max(int(math.ceil(w * k)), 1)
+        pix_h = max(int(math.ceil(h * k)), 1)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, pix_w, pix_h)
+        ctx = cairo.Context(surface)
+        ctx.set_matrix(cairo.Matrix(k, 0, 0, -k, -x * k, (y + h) * k))
+        ctx.set_line_join(cairo.LINE_JOIN_ROUND)
+        ctx.set_line_cap(cairo.LINE_CAP_ROUND)
+
+        saved = self.ctx
+        self.ctx = ctx
+        self._pixel_res = res
+        try:
+            yield
+        finally:
+            self.ctx = saved
+            self._pixel_res = None
+        surface.flush()
+
+        saved.save()
+        saved.translate(x, y + h)
+        saved.scale(1 / k, -1 / k)
+        saved.set_source_surface(surface, 0, 0)
+        saved.paint()
+        saved.restore()
+
+    def _auto_raster_layer(self, rasterize, n, style):
+        """Get a context manager for drawing `n` vertices.
+
+        If `rasterize` is not given, the vertices are rasterized if
+        `n` exceeds the graphics parameter ``raster_threshold``.
+
+        """
+        if rasterize is None:
+            limit = self._get_param('raster_threshold', style)
+            rasterize = limit > 0 and n > limit
+        if rasterize:
+            return self.raster_layer(style=style)
+        return contextlib.nullcontext()
+
+    def _stroke_paths(self, paths, lw, col, data_coords=False):
+        if lw <= 0 or col[3] <= 0:
+            return
         self.ctx.save()
+        self._append_paths(paths, data_coords)
         self.ctx.set_line_width(lw)
         self.ctx.set_source_rgba(*col)
-        nan = np.logical_or(np.isnan(x), np.isnan(y)).nonzero()[0]
-        nan = [-1] + list(nan) + [len(x)]
-        for j in range(1, len(nan)):
-            i0 = nan[j-1] + 1
-            i1 = nan[j]
-            if i0 >= i1:
-                continue
-            self.ctx.move_to(x[i0], y[i0])
-            if i1 == i0+1:
-                # only one vertex, so draw a point instead of a line
-                self.ctx.line_to(x[i0], y[i0])
-                continue
-            for i in range(i0+1, i1):
-                self.ctx.line_to(x[i], y[i])
         self.ctx.stroke()
         self.ctx.restore()
 
-    def _draw_rectangle(self, rects, style):
+    def _draw_rectangle(self, rects, style, bg_col=None):
         s = rects.shape
         if not s or s[-1] != 4:
             raise ValueError('last dimension of rect must have size 4')
@@ -291,91 +526,418 @@ class Axes(device.Device):
         y_max = self.rect[1] + self.rect[3] + gap
         y1[y1 > y_max] = y_max
 
-        bg = self._get_param('rect_bg', style)
         fg = self._get_param('rect_fg', style)
         lw = self._get_param('rect_lw', style)
+        if bg_col is None:
+            bg_col = [self._get_param('rect_bg', style)]
+        bg_col = color.get_array(bg_col, len(x0))
 
         self.ctx.save()
-        for a, b, c, d in zip(x0, x1, y0, y1):
-            self.ctx.rectangle(a, c, b-a, d-c)
-
-        self.ctx.set_source_rgba(*bg)
-        self.ctx.fill_preserve()
-        self.ctx.set_line_width(lw)
-        self.ctx.set_source_rgba(*fg)
-        self.ctx.stroke()
+        for col, idx in color.groups(bg_col):
+            if col[3] <= 0:
+                continue
+            path.append(self.ctx,
+                        path.rectangles(x0[idx], y0[idx], x1[idx], y1[idx]))
+            self.ctx.set_source_rgba(*col)
+            self.ctx.fill()
+        if lw > 0 and fg[3] > 0:
+            path.append(self.ctx, path.rectangles(x0, y0, x1, y1))
+            self.ctx.set_line_width(lw)
+            self.ctx.set_source_rgba(*fg)
+            self.ctx.stroke()
         self.ctx.restore()
 
-    def draw_rectangle(self, rects, *, style=None):
+    def draw_rectangle(self, rects, *, bg_col=None, style=None):
         """Draw one or more rectangles.
 
+        All rectangles are drawn using a single path for each fill
+        color, so that even large numbers of rectangles can be drawn
+        quickly.  Rectangles of the same color are drawn together,
+        and the colors are drawn in the order in which they first
+        occur in `rects`.  Where rectangles of different colors
+        overlap, the stacking order is therefore not necessarily the
+        order of `rects`.
+
         Args:
-            rects ():
-            style ():
+            rects (array with ``shape=(..., 4)``): The rectangles to
+                draw, in data coordinates.  Each rectangle is given
+                as ``[x, y, w, h]``.  Missing values are interpreted
+                as infinite extent.
+            bg_col (optional): Individual fill colors for the
+                rectangles, either as a list with one color per
+                rectangle, or as an array of RGB or RGBA values
+                (see :py:func:`jvplot.color.get_array`).  If this is
+                not set, the ``rect_bg`` graphics parameter is used.
+            style (dict): graphics parameter values to override the
+                canvas settings.
 
         """
         style = param.check_keys(style)
         rects = np.array(rects, dtype=np.float64)
-        self._draw_rectangle(rects, style)
+        self._draw_rectangle(rects, style, bg_col=bg_col)
 
     def _draw_band(self, x, y_lower, y_mid, y_upper, style):
         bg = self._get_param('band_bg', style)
+        lw = self._get_param('plot_lw', style)
+        col = self._get_param('plot_col', style)
+        data_coords = self._get_param('plot_data_coords', style)
 
-        xt = self.offset[0] + self.scale[0] * x
-        yt_lower = self.offset[1] + self.scale[1] * y_lower
-        yt_upper = self.offset[1] + self.scale[1] * y_upper
+        xt, yt_lower = self._path_coords(x, y_lower, data_coords)
+        _, yt_upper = self._path_coords(None, y_upper, data_coords)
 
         if bg[3] > 0:
+            # Every run of vertices where all coordinates are known
+            # gives one polygon, consisting of the lower boundary
+            # followed by the upper boundary in reverse order.
+            valid = ~(np.isnan(xt) | np.isnan(yt_lower) | np.isnan(yt_upper))
+            starts, ends = path.runs(valid)
+            lengths = ends - starts
+            run = np.repeat(np.arange(len(starts)), lengths)
+            fwd = np.flatnonzero(valid)
+            rev = starts[run] + ends[run] - 1 - fwd
+            pos = fwd - starts[run] + 2 * (np.cumsum(lengths) - lengths)[run]
+
+            px = np.empty(2 * len(fwd))
+            py = np.empty(2 * len(fwd))
+            px[pos], py[pos] = xt[fwd], yt_lower[fwd]
+            pos += lengths[run]
+            px[pos], py[pos] = xt[rev], yt_upper[rev]
+            offsets = np.zeros(len(starts) + 1, dtype=int)
+            np.cumsum(2 * lengths, out=offsets[1:])
+
             self.ctx.save()
+            self._append_paths([path.polygons(px, py, offsets)], data_coords)
             self.ctx.set_source_rgba(*bg)
-            op = self.ctx.move_to
-            for xi, yi in zip(xt, yt_lower):
-                op(xi, yi)
-                op = self.ctx.line_to
-            for xi, yi in list(zip(xt, yt_upper))[::-1]:
-                op(xi, yi)
             self.ctx.fill()
             self.ctx.restore()
 
-        self.draw_lines(x, y_lower)
+        paths = [path.lines(xt, yt_lower), path.lines(xt, yt_upper)]
         if y_mid is not None:
-            self.draw_lines(x, y_mid)
-        self.draw_lines(x, y_upper)
+            _, yt_mid = self._path_coords(None, y_mid, data_coords)
+            paths.append(path.lines(xt, yt_mid))
+        self._stroke_paths(paths, lw, col, data_coords)
 
-    def draw_points(self, x, y=None, *, style=None):
+    def draw_points(self, x, y=None, *, col=None, size=None,
+                    color_scale=None, rasterize=None, style=None):
         """Draw a scatter plot.
 
+        By default, all points use the color and size given by the
+        graphics parameters ``plot_point_col`` and ``plot_point_size``.
+        Individual colors and sizes can be given using the `col`
+        and `size` arguments.  Points with the same color and size
+        are drawn together, so that the cost of drawing depends
+        mostly on the number of distinct colors and sizes, rather than
+        on the number of points.  The groups are drawn in the order in
+        which their color and size first occur in the data.
+
+        If the graphics parameter ``plot_point_raster`` is set, the
+        points are not drawn individually.  Instead, the method counts
+        how many points of each color and size cover every pixel, and
+        draws the result as a single image, at the resolution given by
+        ``raster_res``.  Since `n` points of color ``rgba(r,g,b,a)`` on
+        top of each other give opacity ``1 - (1-a)**n``, this gives the
+        same colors as drawing the points one by one, but is much faster
+        for large numbers of translucent points.  The groups of points
+        are composited in the same order as they are drawn in vector
+        mode.  In this mode, the point centres are moved to the centres
+        of the pixels containing them, and the points are clipped to the
+        axes area.
+
+        To keep vector output small when many points fall onto the
+        same position, the graphics parameter ``plot_point_dedup`` can
+        be set to a small distance like ``0.25`` (in device units).
+        Points of the same color and size whose device coordinates
+        agree after rounding to multiples of this distance are then
+        drawn only once, so that the size of the output is bounded by
+        the plot area rather than by the number of points.
+
         Args:
-            x ():
-            y ():
+            x (array with ``shape=(n,)`` or ``shape=(n,2)``): The
+                coordinates of the points.  If `y` is given, `x` must
+                be one-dimensional.  Otherwise, `x` must be
+                two-dimensional with two columns.
+            y (array with ``shape=(n,)``, optional): See the
+                description of `x`.
+            col (optional): Individual colors for the points, either as
+                a list of `n` colors, or as an array of RGB or RGBA
+                values (see :py:func:`jvplot.color.get_array`).  If
+                `color_scale` is given, `col` must instead be an array
+                of `n` data values, which are mapped to colors using
+                the scale.
+            size (optional): Individual sizes for the points, either as
+                an array of `n` numbers (in device units), or as a
+                list of `n` dimensions like ``"2pt"``.
+            color_scale (color.Scale, optional): A color scale to map
+                the values in `col` to colors.  The values are
+                quantized to 256 levels (see
+                :py:meth:`jvplot.color.Scale.quantize`).
+            rasterize (bool, optional): Whether to draw the points as
+                an image, see :py:meth:`draw_lines`.
             style (dict): graphics parameter values to override the
                 canvas settings, setting the line thickness and color.
 
         """
         style = param.check_keys(style)
-        lw = self._get_param('plot_point_size', style)
-        col = self._get_param('plot_point_col', style)
+        x, y = util._check_coords(x, y)
+        with self._auto_raster_layer(rasterize, len(x), style):
+            self._draw_points(x, y, col, size, color_scale, style)
+
+    def _draw_points(self, x, y, col, size, color_scale, style):
         separate = self._get_param('plot_point_separate', style)
+        data_coords = self._get_param('plot_data_coords', style)
 
-        x, y = util._check_coords(x, y)
-        x = self.offset[0] + self.scale[0] * x
-        y = self.offset[1] + self.scale[1] * y
+        self._record_picks(x, y, style)
+        groups = self._point_groups(len(x), col, size, color_scale, style)
+        if self._get_param('plot_point_raster', style):
+            u, v = self._unit_coords(x, y)
+            self._draw_point_image(u, v, groups, style)
+            return
 
-        self.ctx.save()
-        self.ctx.set_line_width(lw)
-        self.ctx.set_source_rgba(*col)
-        if separate:
-            for i in range(len(x)):
-                self.ctx.move_to(x[i], y[i])
-                self.ctx.close_path()
-                self.ctx.stroke()
+        shape = self._get_param('plot_point_shape', style)
+        x, y = self._path_coords(x, y, data_coords)
+        groups = self._dedup_groups(x, y, groups, separate, data_coords, style)
+        self._stroke_dots(x, y, groups, shape, separate, data_coords)
+
+    def _draw_unit_points(self, u, v, style, rows=None):
+        """Draw a scatter plot, given coordinates relative to the axes.
+
+        The coordinates `u` and `v` are scaled so that ``(0, 0)`` is the
+        bottom left corner of the axes rectangle, and ``(1, 1)`` is the
+        top right corner.  This allows to use the same coordinate
+        arrays for all axes with the same data limits.  If the points
+        are a selection of rows from a larger data set, `rows` gives
+        the row numbers reported by :py:meth:`pick`.
+
+        """
+        separate = self._get_param('plot_point_separate', style)
+        x, y, w, h = self.rect
+        m = cairo.Matrix(w, 0, 0, h, x, y)
+        self._record_picks(u, v, style, m, rows)
+        groups = self._point_groups(len(u), None, None, None, style)
+        if self._get_param('plot_point_raster', style):
+            self._draw_point_image(u, v, groups, style)
+            return
+        shape = self._get_param('plot_point_shape', style)
+        groups = self._dedup_groups(u, v, groups, separate, m, style)
+        with self._auto_raster_layer(None, len(u), style):
+            self._stroke_dots(u, v, groups, shape, separate, m)
+
+    def _draw_point_image(self, u, v, groups, style):
+        """Draw a scatter plot as an image, given coordinates relative
+        to the axes.
+
+        The groups of points are composited in the order given, which
+        is also the order used by :py:meth:`_stroke_dots`, using the
+        "over" operator on pre-multiplied colors.
+
+        """
+        w, h = self._raster_size(style)
+        scale = w / self.rect[2]
+        rgb = np.zeros((h, w, 3))
+        alpha = np.zeros((h, w))
+        for c, lw, idx in groups:
+            if c[3] <= 0 or lw <= 0:
+                continue
+            n = raster.point_counts(u[idx] * w, v[idx] * h, lw / 2 * scale,
+                                    w, h)
+            a = 1 - np.power(1 - c[3], n)
+            keep = 1 - a
+            rgb *= keep[:, :, None]
+            rgb += a[:, :, None] * c[:3]
+            alpha *= keep
+            alpha += a
+        if not np.any(alpha > 0):
+            return
+
+        pixels = np.empty((h, w, 4))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pixels[:, :, :3] = np.nan_to_num(rgb / alpha[:, :, None])
+        np.clip(pixels[:, :, :3], 0, 1, out=pixels[:, :, :3])
+        pixels[:, :, 3] = alpha
+        self.draw_image(pixels, self.x_range, self.y_range)
+
+    def _dedup_groups(self, x, y, groups, separate, data_coords, style):
+        """Remove points which are drawn on top of each other.
+
+        If the graphics parameter ``plot_point_dedup`` is positive,
+        the device coordinates of the points are rounded to multiples
+        of this value, and only the first point of each group which
+        is drawn at a given position is kept.  Since the points of a
+        group are drawn as a single path, this does not change the
+        appearance of the plot, up to the rounding.  If the points are
+        drawn separately, no points are removed.
+
+        """
+        step = self._get_param('plot_point_dedup', style)
+        if step <= 0 or separate:
+            return groups
+        dx, dy = self._device_coords(x, y, data_coords)
+        res = []
+        for c, lw, idx in groups:
+            idx = np.arange(len(dx))[idx]
+            keep = raster.dedup(dx[idx], dy[idx], step)
+            res.append((c, lw, idx[keep]))
+        return res
+
+    def _stroke_dots(self, x, y, groups, shape, separate, data_coords):
+        if shape != 'round' and shape not in path.MARKERS:
+            raise ValueError("unknown point shape %r" % shape)
+        if self._pixel_res is not None:
+            x, y = self._device_coords(x, y, data_coords)
+            self._stamp_dots(x, y, groups, shape, separate)
+            return
+        if shape != 'round':
+            # markers are constructed in device coordinates, so that
+            # their shape is not distorted
+            x, y = self._device_coords(x, y, data_coords)
+            data_coords = False
+            step = 2 * len(path.MARKERS[shape]) + 1
         else:
-            for i in range(len(x)):
-                self.ctx.move_to(x[i], y[i])
-                self.ctx.close_path()
-            self.ctx.stroke()
+            step = 3
+
+        self.ctx.save()
+        for c, lw, idx in groups:
+            if c[3] <= 0 or lw <= 0:
+                continue
+            self.ctx.set_source_rgba(*c)
+            if shape == 'round':
+                self.ctx.set_line_width(lw)
+                data = path.dots(x[idx], y[idx])
+                paint = self.ctx.stroke
+            else:
+                data = path.markers(x[idx], y[idx], shape, lw)
+                paint = self.ctx.fill
+            if separate:
+                for k in range(0, len(data), step):
+                    self._append_paths([data[k:k+step]], data_coords)
+                    paint()
+            else:
+                self._append_paths([data], data_coords)
+                paint()
         self.ctx.restore()
 
+    def _stamp_dots(self, x, y, groups, shape, separate):
+        """Draw scatter plot markers for raster image output.
+
+        Instead of rasterizing a path for every point, the markers are
+        rendered once (see :py:class:`jvplot.device._StampCache`) and
+        then used as masks at the point positions, quantized to a
+        fraction of a pixel.  Unless `separate` is set, the markers of
+        each group are first combined into a single coverage mask, so
+        that overlapping translucent markers are shown the same way
+        as a stroked path.  `x` and `y` are given in device
+        coordinates.
+
+        """
+        ctx = self.ctx
+        m = ctx.get_matrix()
+        xx, yx, xy, yy, x0, y0 = m.as_tuple()
+        px = x0 + xx * x + xy * y
+        py = y0 + yx * x + yy * y
+        q = self._stamps.subpixels
+        lib = cairo.cairo
+
+        ctx.save()
+        ctx.identity_matrix()
+        # The target may be a recording surface, so the clip region is
+        # used to find the visible area.
+        cx0, cy0, cx1, cy1 = ctx.clip_extents()
+        x_min, y_min = math.floor(cx0), math.floor(cy0)
+        x_max, y_max = math.ceil(cx1), math.ceil(cy1)
+        for c, lw, idx in groups:
+            if c[3] <= 0 or lw <= 0:
+                continue
+            r = self._stamps.radius(m, lw)
+            gx, gy = px[idx], py[idx]
+            with np.errstate(invalid='ignore'):
+                keep = ((gx > x_min - r) & (gx < x_max + r)
+                        & (gy > y_min - r) & (gy < y_max + r))
+            if not np.any(keep):
+                continue
+            ix, fx = np.divmod(np.rint(gx[keep] * q).astype(np.intp), q)
+            iy, fy = np.divmod(np.rint(gy[keep] * q).astype(np.intp), q)
+            keys = (fx * q + fy).tolist()
+            stamps = {k: self._stamps.get(m, shape, lw, k // q, k % q)
+                      for k in set(keys)}
+
+            ctx.set_source_rgba(*c)
+            if separate:
+                dst = ctx
+                bx, by = 0, 0
+            else:
+                bx = max(int(np.min(ix)) - r, x_min)
+                by = max(int(np.min(iy)) - r, y_min)
+                bw = min(int(np.max(ix)) + r, x_max) - bx
+                bh = min(int(np.max(iy)) + r, y_max) - by
+                if bw <= 0 or bh <= 0:
+                    continue
+                mask = cairo.ImageSurface(cairo.FORMAT_A8, bw, bh)
+                dst = cairo.Context(mask)
+            pointers = {k: path.pointer(s) for k, s in stamps.items()}
+            dst_ptr = path.pointer(dst)
+            for k, i, j in zip(keys, (ix - r - bx).tolist(),
+                               (iy - r - by).tolist()):
+                lib.cairo_mask_surface(dst_ptr, pointers[k], i, j)
+            dst._check_status()
+            if not separate:
+                mask.flush()
+                ctx.mask_surface(mask, bx, by)
+        ctx.restore()
+
+    def _device_coords(self, x, y, data_coords):
+        """Convert coordinates obtained from :py:meth:`_path_coords`,
+        or from :py:meth:`_draw_unit_points`, to device coordinates.
+
+        """
+        if not data_coords:
+            return x, y
+        if isinstance(data_coords, cairo.Matrix):
+            xx, yx, xy, yy, x0, y0 = data_coords.as_tuple()
+            x = np.asarray(x, dtype=np.float64)
+            y = np.asarray(y, dtype=np.float64)
+            return x0 + xx * x + xy * y, y0 + yx * x + yy * y
+        return self._transform(x, y)
+
+    def _point_groups(self, n, col, size, color_scale, style):
+        """Group the points of a scatter plot by color and size.
+
+        Returns a list of triples ``(col, size, idx)``, where `idx`
+        selects the points which use color `col` and size `size`.
+
+        """
+        if col is None and size is None:
+            lw = self._get_param('plot_point_size', style)
+            c = self._get_param('plot_point_col', style)
+            return [(c, lw, slice(None))]
+
+        if col is None:
+            cols = color.get_array([self._get_param('plot_point_col', style)], n)
+        elif color_scale is not None:
+            cols = color.get_array(color_scale.quantize(col), n)
+        else:
+            cols = color.get_array(col, n)
+
+        if size is None:
+            sizes = np.full(n, self._get_param('plot_point_size', style))
+        else:
+            if isinstance(size, str):
+                size = [size]
+            try:
+                sizes = np.array(size, dtype=np.float64).reshape(-1)
+            except ValueError:
+                names = np.array([str(s) for s in size])
+                uniq, inv = np.unique(names, return_inverse=True)
+                table = np.array([util.convert_dim(s, self.res) for s in uniq])
+                sizes = table[inv.reshape(-1)]
+            if len(sizes) == 1:
+                sizes = np.repeat(sizes, n)
+            elif len(sizes) != n:
+                tmpl = "%d point sizes given, but %d are needed"
+                raise ValueError(tmpl % (len(sizes), n))
+
+        keys = np.column_stack([cols, sizes])
+        return [(key[:4], key[4], idx) for key, idx in color.groups(keys)]
+
     def draw_text(self, text, x, y=None, *, horizontal_align="start",
                   vertical_align="baseline", rotate=0, rotate_deg=None,
                   padding=["1pt", "3pt"], style=None):
@@ -414,9 +976,253 @@ class Axes(device.Device):
                         vertical_align=vertical_align, rotate=rotate,
                         padding=padding)
 
+    def pick(self, x, y, *, max_dist=np.inf):
+        """Find the plotted points nearest to the given positions.
+
+        Only points and line vertices drawn while the graphics
+        parameter ``plot_pick`` was set are considered.  Every call to
+        :py:meth:`draw_points` or :py:meth:`draw_lines` (and to the
+        methods of :py:class:`jvplot.canvas.Canvas` based on these)
+        with this parameter set is numbered, starting from 0, and the
+        results refer to the points by call number and position in the
+        data of the call.  The spatial index used for the queries is
+        built on the first query after new points have been drawn.
+
+        Args:
+            x (array): The horizontal positions, in device coordinates.
+            y (array): The vertical positions, in device coordinates.
+            max_dist (number, optional): Points further away than this
+                distance, in device units, are ignored.
+
+        Returns:
+            A tuple ``(series, index, dist)`` of arrays with the same
+            shape as `x` and `y`, where ``series`` gives the call
+            number, ``index`` gives the position of the point within
+            the data of this call (for calls which draw several lines,
+            within the concatenated vertices of all lines), and
+            ``dist`` gives the distance.
+            Where no point is found, ``series`` and ``index`` are -1
+            and ``dist`` is ``inf``.
+
+        """
+        grid, series, index = self._pick_grid()
+        k, dist = grid.nearest(x, y, max_dist)
+        found = k >= 0
+        k = np.where(found, k, 0)
+        return (np.where(found, series[k], -1), np.where(found, index[k], -1),
+                dist)
+
+    def pick_rect(self, x0, y0, x1, y1):
+        """Find all plotted points inside a rectangle.
+
+        The points considered are the same as for :py:meth:`pick`.
+
+        Args:
+            x0 (number): The left edge, in device coordinates.
+            y0 (number): The bottom edge, in device coordinates.
+            x1 (number): The right edge, in device coordinates.
+            y1 (number): The top edge, in device coordinates.
+
+        Returns:
+            A tuple ``(series, index)`` of arrays, describing the
+            points as for :py:meth:`pick`.
+
+        """
+        grid, series, index = self._pick_grid()
+        k = grid.in_rect(x0, y0, x1, y1)
+        return series[k], index[k]
+
+    def _record_picks(self, x, y, style, coords=True, rows=None):
+        """Record points for :py:meth:`pick`.
+
+        The coordinates `x` and `y` are converted to device coordinates
+        as described for :py:meth:`_device_coords`.  If `rows` is given,
+        it gives the indices reported for the points.
+
+        """
+        if not self._get_param('plot_pick', style):
+            return
+        x, y = self._device_coords(x, y, coords)
+        if rows is None:
+            rows = np.arange(len(x))
+        self._picks.append((x, y, rows))
+        self._pick_index = None
+
+    def _pick_grid(self):
+        if self._pick_index is None:
+            lengths = [len(x) for x, _, _ in self._picks]
+            if self._picks:
+                x = np.concatenate([x for x, _, _ in self._picks])
+                y = np.concatenate([y for _, y, _ in self._picks])
+                index = np.concatenate([k for _, _, k in self._picks])
+            else:
+                x = y = np.zeros(0)
+                index = np.zeros(0, dtype=np.intp)
+            series = np.repeat(np.arange(len(lengths)), lengths)
+            self._pick_index = (spatial.PointGrid(x, y), series, index)
+        return self._pick_index
+
+    def draw_texts(self, texts, x, y=None, *, priority=None,
+                   horizontal_align="start", vertical_align="baseline",
+                   padding=["1pt", "3pt"], style=None):
+        """Add many text labels to a canvas, omitting overlapping labels.
+
+        The labels are considered in order of decreasing priority, and
+        every label which would overlap a label placed before is
+        omitted.  The overlap tests use the text extents, including
+        the padding, in device coordinates.  Since the labels are
+        sorted into a uniform grid, the cost of placing the labels is
+        proportional to the number of labels.
+
+        Args:
+            texts (list of str): The texts of the labels.
+            x (array with ``shape=(n,)`` or ``shape=(n,2)``): The
+                positions of the labels in data coordinates.  If `y`
+                is given, `x` must be one-dimensional.  Otherwise,
+                `x` must be two-dimensional with two columns.
+            y (array with ``shape=(n,)``, optional): See the
+                description of `x`.
+            priority (array with ``shape=(n,)``, optional): Labels
+                with higher priority are placed first.  For labels of
+                equal priority, labels earlier in the list are placed
+                first.
+            horizontal_align: Which part of the texts to align at the
+                label positions, see :py:meth:`draw_text`.
+            vertical_align: Which part of the texts to align at the
+                label positions, see :py:meth:`draw_text`.
+            padding: The space around the texts which must be kept
+                free of other labels.
+            style (dict): graphics parameter values to override the
+                canvas settings.
+
+        Returns:
+            A boolean array which indicates which of the labels have
+            been drawn.
+
+        """
+        style = param.check_keys(style)
+        font_size = self._get_param('text_font_size', style)
+        col = self._get_param('text_col', style)
+        bg = self._get_param('text_bg', style)
+
+        x, y = util._check_coords(x, y)
+        texts = [str(t) for t in texts]
+        if len(texts) != len(x):
+            raise ValueError("need %d texts, not %d" % (len(x), len(texts)))
+        x, y = self._transform(x, y)
+
+        boxes = {}
+        for text in set(texts):
+            boxes[text] = self._text_box(
+                text, font_size, horizontal_align=horizontal_align,
+                vertical_align=vertical_align, padding=padding)
+        ext = np.array([boxes[text] for text in texts]).reshape((-1, 4))
+        keep = spatial.declutter(x + ext[:, 0], y + ext[:, 1],
+                                 x + ext[:, 2], y + ext[:, 3],
+                                 priority=priority)
+
+        for k in np.flatnonzero(keep):
+            self._draw_text(x[k], y[k], texts[k], font_size, col=col,
+                            bg_col=bg, horizontal_align=horizontal_align,
+                            vertical_align=vertical_align, padding=padding)
+        return keep
+
+    def draw_line_density(self, x, y=None, *, color_scale=None, log=False,
+                          style=None):
+        """Show the density of a large number of lines as an image.
+
+        Instead of stroking every line, the method counts for every
+        pixel how many of the lines pass through it, and then shows
+        these counts as a raster image.  This is much faster than
+        drawing the lines when many lines overlap, and also shows the
+        structure of regions where semi-transparent lines would
+        saturate.  The resolution of the image is given by the graphics
+        parameter ``raster_res``.
+
+        Args:
+            x: The vertex coordinates, see :py:meth:`draw_lines`.
+            y (optional): The vertex coordinates, see
+                :py:meth:`draw_lines`.  To show the density of many
+                lines, `y` should either be a two-dimensional array
+                with one line per row, or a list of arrays.
+            color_scale (color.Scale, optional): A color scale, which
+                maps the relative density in the range [0, 1] to
+                colors.  If this is not given, the density is shown
+                by varying the opacity of the color ``plot_col``.
+            log (bool, optional): If true, the relative density is
+                computed from the logarithm of the counts.
+            style (dict): graphics parameter values to override the
+                canvas settings.
+
+        """
+        style = param.check_keys(style)
+        col = self._get_param('plot_col', style)
+
+        x, y, offsets = util._check_series(x, y)
+        w, h = self._raster_size(style)
+        u, v = self._unit_coords(x, y)
+        counts = raster.line_counts(u * w, v * h, offsets, w, h)
+
+        n_max = np.max(counts)
+        if n_max == 0:
+            return
+        if log:
+            q = np.log1p(counts) / np.log1p(n_max)
+        else:
+            q = counts / n_max
+        pixels = np.empty((h, w, 4))
+        if color_scale is None:
+            pixels[:, :, :3] = col[:3]
+            pixels[:, :, 3] = q * col[3]
+        else:
+            pixels[:, :, :3] = np.clip(color_scale(q), 0, 1)
+            pixels[:, :, 3] = (counts > 0) * col[3]
+        self.draw_image(pixels, self.x_range, self.y_range)
+
+    def _raster_size(self, style):
+        """Get the number of pixel columns and rows used to rasterize
+        plot elements covering the axes area.
+
+        """
+        res = self._raster_res(style)
+        _, _, rect_w, rect_h = self.rect
+        w = max(int(np.ceil(rect_w / self.res * res)), 1)
+        h = max(int(np.ceil(rect_h / self.res * res)), 1)
+        return w, h
+
+    def _raster_res(self, style):
+        """Get the resolution for rasterized plot elements, in pixels per
+        inch.
+
+        This is given by the graphics parameter ``raster_res``.  If
+        this is 0, the resolution of the pixel grid is used for raster
+        image output, and 300 pixels per inch for vector output.
+
+        """
+        return self._get_param('raster_res', style) or self._pixel_res or 300
+
+    def _unit_coords(self, x, y):
+        """Convert data coordinates to coordinates relative to the axes,
+        see :py:meth:`_draw_unit_points`.
+
+        """
+        x0, x1 = self.x_range
+        y0, y1 = self.y_range
+        u = (np.asarray(x, dtype=np.float64) - x0) / (x1 - x0)
+        v = (np.asarray(y, dtype=np.float64) - y0) / (y1 - y0)
+        return u, v
+
     def draw_histogram(self, hist, bin_edges, *, style=None):
         """Draw a histogram.
 
+        By default, every bin is drawn as a separate box.  If the
+        graphics parameter ``hist_step`` is set, the outline of the
+        histogram is instead drawn as a single polygon, optionally
+        with separating lines between the bins (graphics parameter
+        ``hist_separators``).  This avoids drawing the shared edges
+        between bins twice, and is much faster for histograms with
+        a large number of bins.
+
         Args:
             hist (array): the y-coordinates of the tops of the histogram bars.
             bin_edges (array): the x-coordinates of the bin edges (must be
@@ -429,23 +1235,54 @@ class Axes(device.Device):
         lc = self._get_param('hist_col', style)
         lw = self._get_param('hist_lw', style)
         fc = self._get_param('hist_fill_col', style)
+        step = self._get_param('hist_step', style)
+        separators = self._get_param('hist_separators', style)
+
+        hist = np.asarray(hist, dtype=np.float64).reshape(-1)
+        bin_edges = np.asarray(bin_edges, dtype=np.float64).reshape(-1)
+        if len(bin_edges) != len(hist) + 1:
+            raise ValueError("need one more bin edge than histogram values")
+        if len(hist) == 0:
+            return
 
-        x = self.offset[0] + self.scale[0] * bin_edges
-        y = self.offset[1] + self.scale[1] * hist
+        x, y = self._transform(bin_edges, hist)
+        base = self.offset[1]
+
+        if step:
+            n = len(y)
+            xs = np.empty(2*n + 2)
+            ys = np.empty(2*n + 2)
+            xs[0], ys[0] = x[0], base
+            xs[1:-1:2], ys[1:-1:2] = x[:-1], y
+            xs[2:-1:2], ys[2:-1:2] = x[1:], y
+            xs[-1], ys[-1] = x[-1], base
+            idx = np.arange(2*n + 2)
+            outline = path.encode(xs, ys, idx == 0, idx == 2*n + 1)
+        else:
+            outline = path.rectangles(x[:-1], np.full_like(y, base),
+                                      x[1:], y)
 
         self.ctx.save()
-        for i, yi in enumerate(y):
-            x0 = x[i]
-            x1 = x[i+1]
-            self.ctx.rectangle(x0, self.offset[1],
-                               x1 - x0, yi - self.offset[1])
-        if fc is not None:
+        if fc is not None and fc[3] > 0:
+            path.append(self.ctx, outline)
             self.ctx.set_source_rgba(*fc)
-            self.ctx.fill_preserve()
-        if lw and lc is not None:
+            self.ctx.fill()
+        if lw and lc is not None and lc[3] > 0:
             max_bin_width = np.amax(x[1:] - x[:-1])
             if lw > .25 * max_bin_width:
                 lw = .25 * max_bin_width
+            path.append(self.ctx, outline)
+            if step and separators and len(y) > 1:
+                # Separators run from the base line to the lower one
+                # of the two neighbouring bars.
+                left, right = y[:-1] - base, y[1:] - base
+                top = base + np.where(np.abs(left) < np.abs(right),
+                                      left, right)
+                xs = np.repeat(x[1:-1], 2)
+                ys = np.empty(2*len(top))
+                ys[0::2], ys[1::2] = base, top
+                is_start = np.arange(len(xs)) % 2 == 0
+                path.append(self.ctx, path.encode(xs, ys, is_start, False))
             self.ctx.set_line_width(lw)
             self.ctx.set_source_rgba(*lc)
             self.ctx.stroke()
@@ -519,7 +1356,9 @@ class Axes(device.Device):
         intensities in the range [0, 1].  The array must have the
         shape ``pix_height x pix_width x 3``, where the last
         coordinate indicates the colour channels in the order red,
-        green, blue.
+        green, blue.  Alternatively, the array can have shape
+        ``pix_height x pix_width x 4``, where the last channel gives
+        the opacity of the pixel.
 
         Args:
             pixels (array): the pixel intensities, in the form described
@@ -538,22 +1377,34 @@ class Axes(device.Device):
 
         pixels = np.array(pixels, dtype=np.float64)
         s = pixels.shape
-        if len(s) != 3 or s[2] != 3:
-            raise ValueError("image data must have have shape h x w x 3")
+        if len(s) != 3 or s[2] not in (3, 4):
+            raise ValueError("image data must have have shape h x w x 3 "
+                             "or h x w x 4")
         if np.min(pixels) < 0 or np.max(pixels) > 1:
             raise ValueError("image intensities must be in the range [0, 1]")
         pix_h, pix_w = s[:2]
 
         # prepare a bytearray to hold the image data
         buf = bytearray(pix_w * pix_h * 4)
-        sur_img = cairo.ImageSurface(cairo.FORMAT_RGB24, pix_w, pix_h, buf)
+        if s[2] == 4:
+            fmt = cairo.FORMAT_ARGB32
+        else:
+            fmt = cairo.FORMAT_RGB24
+        sur_img = cairo.ImageSurface(fmt, pix_w, pix_h, buf)
 
         # write the image data into the bytearray
         img = np.asarray(buf).reshape((pix_h, pix_w, 4))
         if sys.byteorder == "little":
             # bring the channels into ARGB order:
             img = img[:, :, ::-1]
-        np.clip(pixels*256, 0, 255, out=img[:, :, 1:])
+        if s[2] == 4:
+            # Cairo uses pre-multiplied alpha
+            alpha = pixels[:, :, 3:]
+            np.clip(alpha*256, 0, 255, out=img[:, :, :1], casting='unsafe')
+            np.clip(pixels[:, :, :3]*alpha*256, 0, 255, out=img[:, :, 1:],
+                    casting='unsafe')
+        else:
+            np.clip(pixels*256, 0, 255, out=img[:, :, 1:], casting='unsafe')
 
         x0 = self.data_to_dev_x(x_range[0])
         x1 = self.data_to_dev_x(x_range[1])
@@ -587,3 +1438,27 @@ def _shift_labels(left, xx, right, ww, sep=10):
     n = len(xx)
     res = opt.minimize(loss, [.5]*n, bounds=[(0, 1)]*n, method='L-BFGS-B')
     return res.x
+
+def _check_ragged(coords, offsets):
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords.shape) != 2 or coords.shape[1] != 2:
+        raise ValueError('coords has wrong shape %s' % repr(coords.shape))
+    offsets = path._check_offsets(offsets, len(coords))
+    return coords[:, 0], coords[:, 1], offsets
+
+def _select_pieces(x, y, offsets, idx):
+    """Select the lines or polygons with indices `idx` from a ragged array.
+
+    Returns the coordinates and offsets for the selected pieces.
+
+    """
+    m = len(offsets) - 1
+    if len(idx) == m:
+        return x, y, offsets
+    in_group = np.zeros(m, dtype=bool)
+    in_group[idx] = True
+    lengths = np.diff(offsets)
+    keep = np.repeat(in_group, lengths)
+    sub_offsets = np.zeros(len(idx) + 1, dtype=int)
+    np.cumsum(lengths[in_group], out=sub_offsets[1:])
+    return x[keep], y[keep], sub_offsets
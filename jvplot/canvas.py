@@ -24,6 +24,7 @@ import numpy as np
 import cairocffi as cairo
 
 from . import axes
+from . import datarange
 from . import device
 from . import hist as histmod
 from . import layout
@@ -114,9 +115,9 @@ class Canvas(device.Device):
             fn = self._on_close.pop()
             fn()
 
-    def plot(self, x, y=None, *, rect=None, x_extra=None, y_extra=None,
-             x_lim=None, y_lim=None, aspect=None, x_lab=None, y_lab=None,
-             style=None):
+    def plot(self, x, y=None, *, col=None, rect=None, x_extra=None,
+             y_extra=None, x_lim=None, y_lim=None, aspect=None, x_lab=None,
+             y_lab=None, style=None):
         """Draw a line plot.
 
         Args:
@@ -128,7 +129,10 @@ class Canvas(device.Device):
                 columns and the vertices are ``x[0, :]``, ...,
                 ``x[n-1, :]``.
             y (array with ``shape=(n,)``, optional): See the
-                description of `x`.
+                description of `x`.  Several lines can be drawn at
+                once, see :py:meth:`jvplot.axes.Axes.draw_lines`.
+            col (optional): Individual colors for the lines, see
+                :py:meth:`jvplot.axes.Axes.draw_lines`.
             rect ():
             x_extra ():
             y_extra ():
@@ -147,17 +151,18 @@ class Canvas(device.Device):
 
         """
         style = param.check_keys(style)
-        x, y = util._check_coords(x, y)
+        x, y, offsets = util._check_series(x, y)
 
         x_range = self.data_range(x, x_extra)
         y_range = self.data_range(y, y_extra)
         rect = rect or self.get_margin_rect(style=style)
         ax = self._add_axes(rect, x_range, y_range, x_lim, y_lim,
                             aspect, style, x_lab=x_lab, y_lab=y_lab)
-        ax.draw_lines(x, y)
+        ax._draw_series(x, y, offsets, col, {})
         return ax
 
-    def scatter_plot(self, x, y=None, *, x_extra=None, y_extra=None,
+    def scatter_plot(self, x, y=None, *, col=None, size=None,
+                     color_scale=None, x_extra=None, y_extra=None,
                      aspect=None, x_lim=None, y_lim=None, rect=None,
                      x_lab=None, y_lab=None, style=None):
         """Draw a scatter plot.
@@ -172,6 +177,12 @@ class Canvas(device.Device):
                 ``x[n-1,:]``.
             y (array with ``shape=(n,)``, optional): See the
                 description of `x`.
+            col (optional): Individual colors for the points, see
+                :py:meth:`jvplot.axes.Axes.draw_points`.
+            size (optional): Individual sizes for the points, see
+                :py:meth:`jvplot.axes.Axes.draw_points`.
+            color_scale (color.Scale, optional): A color scale to map
+                the values in `col` to colors.
             x_extra ():
             y_extra ():
             aspect (number, optional): The aspect ratio of the axes
@@ -195,7 +206,7 @@ class Canvas(device.Device):
         rect = rect or self.get_margin_rect(style=style)
         ax = self._add_axes(rect, x_range, y_range, x_lim, y_lim, aspect, style,
                             x_lab=x_lab, y_lab=y_lab)
-        ax.draw_points(x, y)
+        ax.draw_points(x, y, col=col, size=size, color_scale=color_scale)
         return ax
 
     def band_plot(self, x, y_mid=None, y_lower=None, y_upper=None, *,
@@ -379,7 +390,8 @@ class Canvas(device.Device):
         return np.array(ax_rows)
 
     def pair_scatter_plot(self, z, *, names=None, upper_fn=None, diag_fn=None,
-                          lower_fn=None, style=None):
+                          lower_fn=None, max_points=None, keep_outliers=None,
+                          seed=0, style=None):
         """Create a new pair scatter plot.
 
         Args:
@@ -388,16 +400,56 @@ class Canvas(device.Device):
             upper_fn ():
             diag_fn ():
             lower_fn ():
+            max_points (int, optional): If `z` has more than
+                `max_points` rows, only a sample of `max_points` rows
+                is shown.  The sample is stratified: the rows are
+                split into `max_points` blocks of consecutive rows, and
+                one random row is taken from each block.  The same rows
+                are used in all panels, so that the cost of drawing
+                does not depend on the number of rows.  The axis ranges
+                are still determined from all of the data, which takes
+                time proportional to the number of rows.
+            keep_outliers (number, optional): If this is set together
+                with `max_points`, rows where at least one value lies
+                below the `keep_outliers` quantile or above the
+                ``1 - keep_outliers`` quantile of its column are
+                preferred when choosing the sample, but make up at
+                most half of the sample, so that the bulk of the
+                distribution is still shown.  Computing the quantiles
+                requires a pass over all rows.
+            seed (int, optional): The seed for the random number
+                generator used to choose the sample.  The same seed
+                always gives the same sample.
             style ():
 
         """
         style = param.check_keys(style)
 
-        z = np.array(z)
+        z = np.asarray(z, dtype=np.float64)
         if len(z.shape) != 2:
             raise ValueError("need two-dimensional data for a pair plot")
         _, p = z.shape
         ranges = [self.data_range(z[:, i]) for i in range(p)]
+        rows = None
+        if max_points is not None:
+            idx = _sample_rows(z, max_points, keep_outliers, seed)
+            z = z[idx]
+            if not isinstance(idx, slice):
+                # report the original row numbers in Axes.pick()
+                rows = idx
+
+        # All panels in a row or column normally share the same axis
+        # limits.  Each column is converted into coordinates relative
+        # to the panel once, and the result is reused for all panels
+        # with the same limits.
+        unit_cache = {}
+        def unit(i, lim):
+            key = (i, lim[0], lim[1])
+            u = unit_cache.get(key)
+            if u is None:
+                u = (z[:, i] - lim[0]) / (lim[1] - lim[0])
+                unit_cache[key] = u
+            return u
 
         grid = self.grid_plot(ranges, x_names=names, upper_fn=upper_fn,
                               diag_fn=diag_fn, lower_fn=lower_fn, style=style)
@@ -413,7 +465,9 @@ class Canvas(device.Device):
 
                 if fn is None:
                     ax = grid[row, col]
-                    ax.draw_points(z[:, col], z[:, row])
+                    ax._draw_unit_points(unit(col, ax.x_range),
+                                         unit(row, ax.y_range), {},
+                                         rows=rows)
         return grid
 
     def histogram(self, x, *, bins=None, range=None, weights=None, density=False,
@@ -522,10 +576,12 @@ class Canvas(device.Device):
         representing the data area inside the axes.
 
         Args:
-            x_range (tuple): The horizontal coordinate range to cover.
-                The actual axis range may be larger than this.
-            y_range (tuple): The vertical coordinate range to cover.
-                The actual axis range chosen may be larger than this.
+            x_range (tuple or RangeAccumulator): The horizontal
+                coordinate range to cover.  The actual axis range may
+                be larger than this.
+            y_range (tuple or RangeAccumulator): The vertical
+                coordinate range to cover.  The actual axis range
+                chosen may be larger than this.
             x_lim (tuple): The exact coordinate range for the
                 horizontal axis.
             y_lim (tuple): The exact coordinate range for the vertical
@@ -642,6 +698,10 @@ class Canvas(device.Device):
 
     def _add_axes(self, rect, x_range, y_range, x_lim, y_lim,
                   aspect, style, *, x_lab=None, y_lab=None):
+        if isinstance(x_range, datarange.RangeAccumulator):
+            x_range = x_range.range()
+        if isinstance(y_range, datarange.RangeAccumulator):
+            y_range = y_range.range()
         if not (x_range or x_lim):
             raise ValueError("need to specify either x_range or x_lim")
         if not (y_range or y_lim):
@@ -714,3 +774,41 @@ class Canvas(device.Device):
         self._on_close.append(decorate)
 
         return ax
+
+def _sample_rows(z, k, keep_outliers, seed):
+    """Choose at most `k` rows of `z`, in increasing order.
+
+    The rows are split into `k` blocks of consecutive rows, and one
+    row is chosen at random from every block.  If `keep_outliers` is
+    given, rows outside the quantile envelope are preferred, but they
+    make up at most half of the sample.
+
+    """
+    n = len(z)
+    if n <= k:
+        return slice(None)
+    rng = np.random.default_rng(seed)
+    if keep_outliers is None:
+        return _stratified(n, k, rng)
+
+    lo, hi = np.nanquantile(z, [keep_outliers, 1 - keep_outliers], axis=0)
+    extreme = np.any((z < lo) | (z > hi), axis=1)
+    outer = np.flatnonzero(extreme)
+    inner = np.flatnonzero(~extreme)
+    m = max(min(len(outer), k // 2), k - len(inner))
+    if m < len(outer):
+        outer = outer[_stratified(len(outer), m, rng)]
+    if k - m < len(inner):
+        inner = inner[_stratified(len(inner), k - m, rng)]
+    idx = np.concatenate([outer, inner])
+    idx.sort()
+    return idx
+
+def _stratified(n, k, rng):
+    """Choose one random position from each of `k` blocks of
+    ``range(n)``, where ``0 < k <= n``.  The result is sorted.
+
+    """
+    bounds = np.arange(k + 1) * n // k
+    width = np.diff(bounds)
+    return bounds[:-1] + (rng.random(k) * width).astype(np.intp)
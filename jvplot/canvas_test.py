@@ -1,15 +1,49 @@
 #! /usr/bin/env python3
 
+import os
+
 import pytest
 
+import numpy as np
+
+import cairocffi as cairo
+
 from . import canvas
 from . import color
 from . import errors
 from . import param
+from . import path
 from . import plot
 from . import util
 
 
+def _record_paths(monkeypatch):
+    """Record all path data added using path.append().
+
+    Every call is recorded as a list of ``(points, closed)`` pairs,
+    one for each sub-path.
+
+    """
+    calls = []
+    append = path.append
+    def record(ctx, data):
+        hdr = data.view(np.int32)
+        sub_paths = []
+        i = 0
+        while i < len(data):
+            tp, length = hdr[i, 0], hdr[i, 1]
+            if tp == cairo.PATH_MOVE_TO:
+                sub_paths.append(([], False))
+            if tp == cairo.PATH_CLOSE_PATH:
+                sub_paths[-1] = (sub_paths[-1][0], True)
+            else:
+                sub_paths[-1][0].append(tuple(data[i+1]))
+            i += length
+        calls.append(sub_paths)
+        append(ctx, data)
+    monkeypatch.setattr(path, 'append', record)
+    return calls
+
 def test_canvas_param():
     res = 100
     lw = '17pt'
@@ -89,3 +123,413 @@ def test_grid_plot():
     with plot.Plot('/dev/null', '3in', '5in') as pl:
         grid = pl.grid_plot(ranges)
         assert grid.shape == (m, m)
+
+def test_histogram_step(monkeypatch):
+    x = np.random.default_rng(1).normal(size=1000)
+    for step in [False, True]:
+        style = {'hist_step': step, 'hist_separators': True}
+        with plot.Plot('/dev/null', '3in', '3in') as pl:
+            ax = pl.histogram(x, bins=100, style=style)
+            with pytest.raises(ValueError):
+                ax.draw_histogram([1, 2, 3], [0, 1, 2], style=style)
+
+    hist = [1, 3, 2]
+    edges = [0, 1, 2, 3]
+    for step, separators in [(False, True), (True, False), (True, True)]:
+        with plot.Plot('/dev/null', '3in', '3in') as pl:
+            ax = pl.axes(x_lim=(0, 3), y_lim=(0, 4))
+            calls = _record_paths(monkeypatch)
+            ax.draw_histogram(hist, edges, style={
+                'hist_step': step,
+                'hist_separators': separators,
+            })
+            monkeypatch.undo()
+            xd, yd = ax._transform(edges, [0, 1, 2, 3])
+
+        # the same outline is used for filling and stroking
+        fill, outline = calls[:2]
+        assert fill == outline
+        if not step:
+            assert len(calls) == 2
+            assert [(len(pts), closed) for pts, closed in outline] \
+                == [(4, True)] * 3
+            continue
+        assert len(outline) == 1
+        pts, closed = outline[0]
+        assert closed and len(pts) == 2*len(hist) + 2
+        assert np.allclose(pts[0], (xd[0], yd[0]))
+        assert np.allclose(pts[1], (xd[0], yd[1]))
+        assert np.allclose(pts[3], (xd[1], yd[3]))
+        assert np.allclose(pts[-1], (xd[3], yd[0]))
+        if not separators:
+            assert len(calls) == 2
+            continue
+
+        # the separators end at the lower one of the neighbouring bars
+        assert len(calls) == 3
+        expected = [([(xd[1], yd[0]), (xd[1], yd[1])], False),
+                    ([(xd[2], yd[0]), (xd[2], yd[2])], False)]
+        assert len(calls[2]) == len(expected)
+        for (pts, closed), (pts_ex, closed_ex) in zip(calls[2], expected):
+            assert closed == closed_ex
+            assert np.allclose(pts, pts_ex)
+
+def test_band_plot_gaps(monkeypatch):
+    x = np.linspace(0, 1, 50)
+    y = np.sin(x)
+    y[10] = np.nan
+    with plot.Plot('/dev/null', '3in', '3in') as pl:
+        pl.band_plot(x, y, y_width=.1)
+
+    with plot.Plot('/dev/null', '3in', '3in') as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(-1, 2))
+        calls = _record_paths(monkeypatch)
+        ax._draw_band(x, y - .1, y, y + .1, {})
+        monkeypatch.undo()
+        xd, yd = ax._transform(x, y - .1)
+
+    # the nan splits the band into two polygons, and every line
+    # into two pieces
+    band, lower, upper, mid = calls
+    assert [(len(pts), closed) for pts, closed in band] \
+        == [(20, True), (78, True)]
+    for line in [lower, upper, mid]:
+        assert [(len(pts), closed) for pts, closed in line] \
+            == [(10, False), (39, False)]
+    pts = np.array(band[1][0])
+    assert np.allclose(pts[:39], np.column_stack([xd[11:], yd[11:]]))
+    assert np.allclose(pts[39:], np.array(upper[1][0])[::-1])
+
+def test_scatter_plot_colors():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=(500, 2))
+    cols = np.where(x[:, 0] > 0, 'red', 'blue')
+    sizes = np.where(x[:, 1] > 0, 2, 4)
+    scale = color.Scale(['white', 'black'], x[:, 0])
+    with plot.Plot('/dev/null', '3in', '3in') as pl:
+        pl.scatter_plot(x, col=cols, size=sizes)
+        ax = pl.scatter_plot(x, col=x[:, 0], color_scale=scale)
+        ax.draw_points(x, size=["1pt", "2pt"] * 250,
+                       style={'plot_point_separate': True})
+        with pytest.raises(ValueError):
+            ax.draw_points(x, col=['red', 'green', 'blue'])
+
+def test_draw_image():
+    for pixels, expected in [(np.array([[[1, .5, 0]]]), [255, 128, 0]),
+                             (np.array([[[1, .5, 0, .5]]]), [255, 191, 127])]:
+        with plot.Plot(None, 10, 10) as pl:
+            ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1), rect=[0, 0, 10, 10],
+                         style={'axis_ticks': '', 'axis_border_lw': 0})
+            ax.draw_image(pixels)
+        assert np.allclose(pl.pixels()[5, 5], expected, atol=1)
+
+def test_data_coords():
+    rng = np.random.default_rng(1)
+    x = np.linspace(0, 1, 50)
+    y = rng.uniform(size=50)
+
+    images = []
+    for data_coords in [False, True]:
+        S = {'plot_data_coords': data_coords, 'bg_col': 'white'}
+        with plot.Plot(None, 200, 150, style=S) as pl:
+            ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1))
+            ax.draw_lines(x, y)
+            ax.draw_points(x, 1 - y)
+            pl.band_plot(x, y, y - .1, y + .1, rect=[10, 10, 80, 60])
+        images.append(pl.pixels().astype(int))
+    assert np.mean(np.abs(images[0] - images[1])) < 1
+
+def test_pair_scatter_plot():
+    rng = np.random.default_rng(2)
+    z = rng.standard_normal((300, 3))
+
+    with plot.Plot(None, 300, 300, style={'bg_col': 'white'}) as pl:
+        grid = pl.pair_scatter_plot(z)
+    assert grid.shape == (3, 3)
+    fast = pl.pixels().astype(int)
+
+    with plot.Plot(None, 300, 300, style={'bg_col': 'white'}) as pl:
+        ranges = [pl.data_range(z[:, i]) for i in range(3)]
+        grid = pl.grid_plot(ranges)
+        for row in range(3):
+            for col in range(3):
+                grid[row, col].draw_points(z[:, col], z[:, row])
+    slow = pl.pixels().astype(int)
+    assert np.mean(np.abs(fast - slow)) < 1
+
+def test_sample_rows():
+    rng = np.random.default_rng(3)
+    z = rng.standard_normal((10000, 2))
+    idx = canvas._sample_rows(z, 500, None, 1)
+    assert len(idx) == 500 and np.all(np.diff(idx) > 0)
+    assert np.array_equal(idx, canvas._sample_rows(z, 500, None, 1))
+    assert canvas._sample_rows(z, 20000, None, 1) == slice(None)
+
+    # one row from every block of 20 rows
+    assert np.array_equal(idx // 20, np.arange(500))
+
+    idx = canvas._sample_rows(z, 500, 0.001, 1)
+    assert len(idx) == 500 and np.all(np.diff(idx) > 0)
+    assert np.argmax(z[:, 0]) in idx and np.argmin(z[:, 1]) in idx
+
+    # outliers make up at most half of the sample
+    idx = canvas._sample_rows(z, 500, 0.1, 1)
+    lo, hi = np.quantile(z, [.1, .9], axis=0)
+    extreme = np.any((z[idx] < lo) | (z[idx] > hi), axis=1)
+    assert len(idx) == 500 and np.sum(extreme) == 250
+
+    with plot.Plot("/dev/null", "4in") as pl:
+        pl.pair_scatter_plot(z, max_points=100, keep_outliers=0.01)
+
+def test_plot_many_lines():
+    rng = np.random.default_rng(4)
+    y = np.cumsum(rng.standard_normal((50, 100)), axis=1)
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.plot(np.arange(100), y)
+        assert ax.y_range[0] <= np.min(y) and ax.y_range[1] >= np.max(y)
+        ax.draw_lines(np.arange(100), list(y[:5]),
+                      col=['red', 'blue', 'red', 'green', 'blue'])
+        pl.plot([[1, 2], [1, 2, 3]], [[1, 2], [3, 4, 2]], col=['black'])
+
+def test_ragged(monkeypatch):
+    rng = np.random.default_rng(5)
+    lengths = rng.integers(3, 10, size=200)
+    offsets = np.zeros(len(lengths) + 1, dtype=int)
+    np.cumsum(lengths, out=offsets[1:])
+    coords = rng.uniform(0, 1, size=(offsets[-1], 2))
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1))
+        ax.draw_polylines(coords, offsets)
+        ax.draw_polylines(coords, offsets, col=rng.uniform(size=(200, 3)))
+        ax.draw_polygons(coords, offsets,
+                         bg_col=['red', 'green'] * 100,
+                         style={'polygon_lw': '.5pt'})
+        with pytest.raises(ValueError):
+            ax.draw_polygons(coords, offsets[:-1])
+
+        # every piece gives one sub-path
+        calls = _record_paths(monkeypatch)
+        ax.draw_polylines(coords, offsets)
+        monkeypatch.undo()
+        xd, yd = ax._transform(coords[:, 0], coords[:, 1])
+    lines, = calls
+    assert [(len(pts), closed) for pts, closed in lines] \
+        == [(k, False) for k in lengths]
+    for (pts, _), a, b in zip(lines, offsets[:-1], offsets[1:]):
+        assert np.allclose(pts, np.column_stack([xd[a:b], yd[a:b]]))
+
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1))
+        calls = _record_paths(monkeypatch)
+        ax.draw_polygons(coords, offsets, bg_col=['red', 'green'] * 100,
+                         style={'polygon_lw': '.5pt'})
+        monkeypatch.undo()
+
+    # one fill per colour, followed by the outlines of all polygons
+    assert len(calls) == 3
+    sizes = [[len(pts) for pts, _ in sub_paths] for sub_paths in calls[:2]]
+    assert sorted(sizes) == sorted([list(lengths[0::2]),
+                                    list(lengths[1::2])])
+    assert all(closed for sub_paths in calls for _, closed in sub_paths)
+    assert [len(pts) for pts, _ in calls[2]] == list(lengths)
+
+def test_line_density(monkeypatch):
+    rng = np.random.default_rng(6)
+    y = np.cumsum(rng.standard_normal((1000, 50)), axis=1)
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.axes(x_lim=(0, 49), y_lim=(np.min(y), np.max(y)))
+        ax.draw_line_density(np.arange(50), y)
+        ax.draw_line_density(np.arange(50), y, log=True,
+                             color_scale=color.Scale(['white', 'red'], [0, 1]),
+                             style={'raster_res': 50})
+
+    # three lines at y=.25 and one line at y=.75, on a 10x10 grid
+    with plot.Plot("/dev/null", 100, 100) as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1), rect=[0, 0, 72, 72])
+        images = []
+        monkeypatch.setattr(ax, 'draw_image',
+                            lambda pixels, *args, **kwargs: images.append(pixels))
+        y = [[.25, .25]] * 3 + [[.75, .75]]
+        style = {'raster_res': 10, 'plot_col': 'black'}
+        ax.draw_line_density([0, 1], y, style=style)
+        ax.draw_line_density([0, 1], y, log=True, style=style)
+    expected = np.zeros((10, 10))
+    expected[2, :] = 1
+    expected[7, :] = 1/3
+    assert np.allclose(images[0][:, :, :3], 0)
+    assert np.allclose(images[0][:, :, 3], expected)
+    expected[7, :] = np.log(2) / np.log(4)
+    assert np.allclose(images[1][:, :, 3], expected)
+
+def test_point_raster():
+    rng = np.random.default_rng(7)
+    z = rng.standard_normal((10000, 2))
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        pl.scatter_plot(z, style={
+            'plot_point_col': 'rgba(0,0,0,.05)',
+            'plot_point_raster': True,
+        })
+        ax = pl.axes(x_lim=(-4, 4), y_lim=(-4, 4))
+        ax.draw_points(z, col=['rgba(255,0,0,.1)', 'rgba(0,0,255,.1)'] * 5000,
+                       size=np.linspace(1, 5, 10000),
+                       style={'plot_point_raster': True, 'raster_res': 100})
+
+def test_point_raster_order():
+    # the point given last is drawn on top, both in raster and in
+    # vector mode
+    centres = []
+    for raster_mode in [False, True]:
+        with plot.Plot(None, 40, 40) as pl:
+            ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1), rect=[0, 0, 40, 40],
+                         style={'axis_ticks': '', 'axis_border_lw': 0})
+            ax.draw_points([.5, .5], [.5, .5], col=['red', 'blue'], size=10,
+                           style={'plot_point_raster': raster_mode})
+        centres.append(pl.pixels()[20, 20])
+    assert np.array_equal(centres[0], centres[1])
+    assert np.array_equal(centres[0], [0, 0, 255])
+
+def test_point_shapes(tmp_path):
+    rng = np.random.default_rng(8)
+    z = rng.standard_normal((1000, 2))
+    for file_name in ["/dev/null", None]:
+        with plot.Plot(file_name, 200, 150) as pl:
+            ax = pl.axes(x_lim=(-3, 3), y_lim=(-3, 3))
+            for shape in ['round', 'square', 'triangle', 'cross']:
+                ax.draw_points(z, style={
+                    'plot_point_shape': shape,
+                    'plot_point_col': 'rgba(0,0,0,.5)',
+                })
+            ax.draw_points(z, size=rng.uniform(1, 5, size=1000), style={
+                'plot_point_shape': 'square',
+                'plot_point_separate': True,
+            })
+            with pytest.raises(ValueError):
+                ax.draw_points(z, style={'plot_point_shape': 'star'})
+
+    # stamped markers are drawn at the same place as stroked dots
+    with plot.Plot(None, 60, 60) as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1), rect=[0, 0, 60, 60],
+                     style={'axis_ticks': '', 'axis_border_lw': 0})
+        ax.draw_points([.5], [.5], style={'plot_point_size': 10,
+                                          'plot_point_col': 'black'})
+    dark = np.argwhere(pl.pixels()[:, :, 0] < 128)
+    assert np.allclose(np.mean(dark, axis=0), 29.5, atol=.5)
+
+    # recorded raster outputs use the same stamps as image surfaces
+    pngs = [str(tmp_path / name) for name in ["a.png", "b.png"]]
+    images = []
+    for file_name in [None, pngs]:
+        with plot.Plot(file_name, 200, 150) as pl:
+            ax = pl.axes(x_lim=(-3, 3), y_lim=(-3, 3))
+            ax.draw_points(z, style={'plot_point_shape': 'triangle',
+                                     'plot_point_col': 'rgba(0,0,0,.5)'})
+        images.append(pl.pixels())
+    assert np.array_equal(images[0], images[1])
+
+def test_draw_texts():
+    rng = np.random.default_rng(9)
+    z = rng.standard_normal((2000, 2))
+    labels = ["P%d" % i for i in range(2000)]
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.scatter_plot(z)
+        keep = ax.draw_texts(labels, z, priority=-np.hypot(z[:, 0], z[:, 1]),
+                             horizontal_align="center",
+                             vertical_align="bottom")
+        assert keep.dtype == bool and 0 < np.sum(keep) < 2000
+        assert keep[np.argmin(np.hypot(z[:, 0], z[:, 1]))]
+        with pytest.raises(ValueError):
+            ax.draw_texts(labels[:10], z)
+
+def test_pick():
+    rng = np.random.default_rng(10)
+    z = rng.standard_normal((1000, 2))
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.scatter_plot(z, style={'plot_pick': True})
+        ax.draw_lines([0, 1, 2], [0, 1, 0], style={'plot_pick': False})
+        ax.draw_lines([0, 1, 2], [0, -1, 0])
+
+        x, y = ax._transform(z[:, 0], z[:, 1])
+        series, index, dist = ax.pick(x[:10] + .01, y[:10])
+        assert np.array_equal(series, [0] * 10)
+        assert np.array_equal(index, np.arange(10))
+        assert np.allclose(dist, .01)
+
+        x, y = ax._transform([1], [-1])
+        series, index, dist = ax.pick(x, y)
+        assert series[0] == 1 and index[0] == 1 and dist[0] == 0
+
+        x0, y0 = ax._transform(0, 0)
+        x1, y1 = ax._transform(1, 1)
+        series, index = ax.pick_rect(x0, y0, x1, y1)
+        inside = (z[:, 0] >= 0) & (z[:, 0] <= 1) & (z[:, 1] >= 0) & (z[:, 1] <= 1)
+        assert set(index[series == 0]) == set(np.flatnonzero(inside))
+        assert set(index[series == 1]) == {0}
+
+    # pair scatter plots report the rows of the full data set
+    z = rng.standard_normal((1000, 3))
+    with plot.Plot("/dev/null", "4in") as pl:
+        grid = pl.pair_scatter_plot(z, max_points=100,
+                                    style={'plot_pick': True})
+        ax = grid[0, 1]
+        x, y, w, h = ax.rect
+        series, index = ax.pick_rect(x, y, x + w, y + h)
+        assert np.all(series == 0)
+        assert len(set(index)) == 100
+        k = index[:10]
+        series, found, dist = ax.pick(*ax._transform(z[k, 1], z[k, 0]))
+        assert np.array_equal(found, k)
+        assert np.allclose(dist, 0)
+
+def test_point_dedup():
+    rng = np.random.default_rng(11)
+    z = np.round(rng.standard_normal((10000, 2)), 1)
+    with plot.Plot("/dev/null", "4in", "3in") as pl:
+        ax = pl.axes(x_lim=(-4, 4), y_lim=(-4, 4),
+                     style={'plot_point_dedup': .25})
+        groups = ax._point_groups(len(z), None, None, None, {})
+        x, y = ax._transform(z[:, 0], z[:, 1])
+        (_, _, idx), = ax._dedup_groups(x, y, groups, False, False, {})
+        assert len(idx) == len(np.unique(z, axis=0))
+        ax.draw_points(z, col=['red', 'blue'] * 5000)
+        pl.pair_scatter_plot(z, style={'plot_point_dedup': 1})
+
+def test_raster_layer(tmp_path):
+    rng = np.random.default_rng(12)
+    z = rng.standard_normal((20000, 2))
+    y = np.cumsum(rng.standard_normal((20, 500)), axis=1)
+
+    names = [str(tmp_path / name) for name in ["a.pdf", "b.pdf"]]
+    with plot.Plot(names[0], "4in", "3in") as pl:
+        ax = pl.scatter_plot(z)
+        ax.draw_lines(np.linspace(-3, 3, 500), y / 10)
+    with plot.Plot(names[1], "4in", "3in",
+                   style={'raster_threshold': 1000, 'raster_res': 100}) as pl:
+        ax = pl.scatter_plot(z)
+        ax.draw_lines(np.linspace(-3, 3, 500), y / 10)
+        ax.draw_lines([-1, 1], [-1, 1], rasterize=True)
+        with ax.raster_layer():
+            ax.draw_polylines(z[:100], [0, 50, 100])
+            ax.draw_polygons(z[:100], [0, 50, 100], rasterize=False)
+    sizes = [os.path.getsize(name) for name in names]
+    assert sizes[1] < sizes[0]
+
+    with plot.Plot(None, 100, 100) as pl:
+        ax = pl.axes(x_lim=(-3, 3), y_lim=(-3, 3))
+        with ax.raster_layer():
+            assert isinstance(ax.ctx.get_target(), cairo.ImageSurface)
+        ax.draw_points(z, rasterize=True)
+
+    # raster outputs which are recorded first are not rasterized twice
+    pngs = [str(tmp_path / name) for name in ["c.png", "d.png"]]
+    for file_name, tile_size in [(pngs, None), (pngs[0], 32)]:
+        with plot.Plot(file_name, 100, 100, tile_size=tile_size) as pl:
+            assert isinstance(pl.ctx.get_target(), cairo.RecordingSurface)
+            ax = pl.axes(x_lim=(-3, 3), y_lim=(-3, 3))
+            ctx = ax.ctx
+            with ax.raster_layer():
+                assert ax.ctx is ctx
+    with plot.Plot([names[0], pngs[0]], 100, 100) as pl:
+        ax = pl.axes(x_lim=(-3, 3), y_lim=(-3, 3))
+        ctx = ax.ctx
+        with ax.raster_layer():
+            assert ax.ctx is not ctx
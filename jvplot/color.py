@@ -1027,6 +1027,81 @@ def get(col):
     return (r, g, b, a)
 
 
+def get_array(cols, n):
+    """Convert a list of colors into an array of RGBA values.
+
+    Args:
+        cols: Either a single color, or a list of `n` colors.  Colors
+            can be given in any form understood by :py:func:`get`.
+            Alternatively, `cols` can be a numeric array of shape
+            ``(n, 3)`` or ``(n, 4)``, giving RGB or RGBA values in
+            the range [0, 1].
+        n (int): The number of colors required.
+
+    Returns:
+        An array of shape ``(n, 4)``.
+
+    """
+    if cols is None or isinstance(cols, str):
+        cols = [cols]
+    try:
+        res = np.array(cols, dtype=np.float64)
+    except (ValueError, TypeError):
+        res = None
+    if res is not None and res.ndim == 1 and len(res) in (3, 4):
+        res = res.reshape((1, -1))
+    if res is not None and res.ndim == 2 and res.shape[1] in (3, 4):
+        if res.shape[1] == 3:
+            res = np.concatenate([res, np.ones((len(res), 1))], axis=1)
+        if np.any(res < 0) or np.any(res > 1):
+            raise ValueError('color components out of range')
+    else:
+        # Convert every distinct color specification only once.
+        names = np.array([c if isinstance(c, str) else repr(c)
+                          for c in cols])
+        _, idx, inv = np.unique(names, return_index=True,
+                                   return_inverse=True)
+        table = np.array([get(cols[i]) for i in idx], dtype=np.float64)
+        res = table[inv.reshape(-1)]
+
+    if len(res) == 1:
+        res = np.repeat(res, n, axis=0)
+    elif len(res) != n:
+        tmpl = "%d colors given, but %d are needed"
+        raise ValueError(tmpl % (len(res), n))
+    return res
+
+
+def groups(cols):
+    """Group identical colors.
+
+    This is used to draw objects of the same color together, so that
+    the Cairo source needs to be changed only once for each distinct
+    color.
+
+    Args:
+        cols (array with ``shape=(n, 4)``): RGBA color values, as
+            returned by :py:func:`get_array`.
+
+    Returns:
+        A list of pairs ``(col, idx)`` where `col` is an RGBA tuple,
+        and `idx` is an array of the indices where this color occurs.
+        Within each group, indices are sorted in increasing order.
+        The groups are ordered by the first index where each color
+        occurs, so that colors used later are drawn on top.
+
+    """
+    uniq, inv = np.unique(cols, axis=0, return_inverse=True)
+    inv = inv.reshape(-1)
+    order = np.argsort(inv, kind='stable')
+    bounds = np.zeros(len(uniq)+1, dtype=int)
+    np.cumsum(np.bincount(inv, minlength=len(uniq)), out=bounds[1:])
+    # since the sort is stable, each group starts with its first index
+    first = order[bounds[:-1]]
+    return [(tuple(uniq[k]), order[bounds[k]:bounds[k+1]])
+            for k in np.argsort(first)]
+
+
 class Scale:
 
     def __init__(self, colors, *data, amplify_min=0.0, smooth=.1):
@@ -1066,5 +1141,32 @@ class Scale:
         w = np.maximum(w, 0)
         return np.tensordot(w, self.colors, axes=1)
 
+    def quantize(self, x, levels=256):
+        """Map data values to colors, using a limited number of colors.
+
+        The range of the scale is divided into `levels` equally spaced
+        steps and every value in `x` is mapped to the color of the
+        nearest step.  Values outside the range of the scale, and
+        missing values, are mapped to the colors at the ends of the
+        scale.
+
+        Args:
+            x (array): the data values.
+            levels (int): the number of different colors to use.
+
+        Returns:
+            An array of RGB values, with shape ``x.shape + (3,)``.
+
+        """
+        x = np.asarray(x, dtype=np.float64)
+        lo, hi = self.data_range()
+        if hi > lo:
+            q = (np.nan_to_num(x, nan=lo) - lo) / (hi - lo)
+        else:
+            q = np.zeros(x.shape)
+        k = np.rint(np.clip(q, 0, 1) * (levels - 1)).astype(int)
+        table = self(lo + (hi - lo) * np.arange(levels) / (levels - 1))
+        return np.clip(table, 0, 1)[k]
+
     def data_range(self):
         return (self.steps[0], self.steps[-1])
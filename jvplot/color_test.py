@@ -1,5 +1,7 @@
 import pytest
 
+import numpy as np
+
 from . import color
 
 
@@ -44,3 +46,44 @@ def test_color():
     assert g == pytest.approx(.5)
     assert b == pytest.approx(1.0)
     assert a == pytest.approx(.3)
+
+def test_get_array():
+    cols = color.get_array(['red', '#000', 'red'], 3)
+    assert cols.shape == (3, 4)
+    assert tuple(cols[0]) == color.get('red')
+    assert tuple(cols[1]) == (0, 0, 0, 1)
+
+    cols = color.get_array('white', 5)
+    assert cols.shape == (5, 4)
+
+    cols = color.get_array([[1, 0, 0], [0, 1, 0]], 2)
+    assert tuple(cols[1]) == (0, 1, 0, 1)
+
+    with pytest.raises(ValueError):
+        color.get_array(['red', 'blue'], 3)
+    with pytest.raises(ValueError):
+        color.get_array([[2, 0, 0]], 1)
+
+def test_groups():
+    cols = color.get_array(['red', 'blue', 'red', 'blue', 'white'], 5)
+    groups = color.groups(cols)
+    assert len(groups) == 3
+    seen = []
+    for col, idx in groups:
+        assert all(tuple(cols[i]) == col for i in idx)
+        assert list(idx) == sorted(idx)
+        seen.extend(idx)
+    assert sorted(seen) == list(range(5))
+
+    # groups are ordered by first occurrence
+    cols = color.get_array(['white', 'red', 'blue', 'red'], 4)
+    assert [list(idx) for _, idx in color.groups(cols)] == [[0], [1, 3], [2]]
+
+def test_quantize():
+    scale = color.Scale(['white', 'black'], [0, 1])
+    cols = scale.quantize([0, 1, 2, -1, float('nan')], levels=8)
+    assert cols.shape == (5, 3)
+    assert tuple(cols[0]) == tuple(cols[3]) == tuple(cols[4])
+    assert tuple(cols[1]) == tuple(cols[2])
+    assert len(set(tuple(c) for c in scale.quantize(np.linspace(0, 1, 100),
+                                                  levels=8))) == 8
@@ -0,0 +1,199 @@
+# datarange.py - determine the range of data values
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Data Ranges
+-----------
+
+This module implements the logic used to find the range of data
+values for the axes of a plot.  The
+:py:class:`RangeAccumulator` class allows to determine ranges
+incrementally, for data which is only available in chunks.
+
+"""
+
+import threading
+
+import numpy as np
+
+
+def finite_range(*args):
+    """Determine the range of all (finite) values in `args`.
+
+    This is the same as :py:meth:`jvplot.device.Device.data_range`,
+    except that no error is raised if `args` contains no finite
+    values.  In this case, the "empty" range ``(inf, -inf)`` is
+    returned.
+
+    Args:
+        *args: All arguments are flattened.  The flattened version
+            must consists of numeric values, and the range of the
+            collection of all these numbers is returned.
+
+    """
+    lower = np.inf
+    upper = -np.inf
+    for arg in args:
+        # ignore default values for unset parameters
+        if arg is None:
+            continue
+
+        if isinstance(arg, RangeAccumulator):
+            a, b = arg._bounds()
+            if a < lower:
+                lower = a
+            if b > upper:
+                upper = b
+            continue
+
+        # numbers are easy
+        if isinstance(arg, (float, int)):
+            if not np.isfinite(arg):
+                continue
+            if arg < lower:
+                lower = arg
+            if arg > upper:
+                upper = arg
+            continue
+
+        # try whether numpy can deal with `arg`
+        try:
+            aa = np.asarray(arg).ravel()
+            aa = aa[np.isfinite(aa)]
+            a = np.min(aa) if aa.size else np.inf
+            b = np.max(aa) if aa.size else -np.inf
+        except (ValueError, TypeError):
+            a = None
+        if a is not None:
+            if a < lower:
+                lower = a
+            if b > upper:
+                upper = b
+            continue
+
+        if not isinstance(arg, str):
+            # try whether `arg` is iterable
+            try:
+                for a2 in arg:
+                    a, b = finite_range(a2)
+                    if a < lower:
+                        lower = a
+                    if b > upper:
+                        upper = b
+                continue
+            except TypeError:
+                pass
+        raise TypeError(f"invalid data range {arg!r}")
+
+    return lower, upper
+
+
+class RangeAccumulator:
+
+    """Determine a data range incrementally.
+
+    Data can be added in chunks using the :py:meth:`update` method,
+    and accumulators for different parts of the data can be combined
+    using :py:meth:`merge`.  Only the minimum and maximum of the
+    finite values seen so far are stored, so the data does not need
+    to be kept in memory.  All methods can be called concurrently
+    from several threads.
+
+    A ``RangeAccumulator`` can be used anywhere a data range or one
+    of the ``x_extra`` and ``y_extra`` arguments is expected.
+
+    Example::
+
+        acc = RangeAccumulator()
+        for chunk in chunks:
+            acc.update(chunk)
+        ax = pl.axes(x_range=acc, y_range=(0, 1))
+
+    """
+
+    def __init__(self, *args):
+        """Create a new accumulator.
+
+        Args:
+            *args: Optional initial data, interpreted as for
+                :py:meth:`update`.
+
+        """
+        self._lock = threading.Lock()
+        self.lower = np.inf
+        """The smallest finite value seen so far (read only)."""
+        self.upper = -np.inf
+        """The largest finite value seen so far (read only)."""
+        if args:
+            self.update(*args)
+
+    def __str__(self):
+        lower, upper = self._bounds()
+        return f"<RangeAccumulator {lower} to {upper}>"
+
+    def update(self, *args):
+        """Add a chunk of data to the accumulator.
+
+        Non-finite values are ignored.  Chunks which contain no
+        finite values at all are allowed.
+
+        Args:
+            *args: The data to add, in any of the forms accepted
+                by :py:meth:`jvplot.device.Device.data_range`.
+
+        Returns:
+            The accumulator itself, to allow chaining of calls.
+
+        """
+        # The expensive part is done without holding the lock.
+        a, b = finite_range(*args)
+        with self._lock:
+            if a < self.lower:
+                self.lower = a
+            if b > self.upper:
+                self.upper = b
+        return self
+
+    def merge(self, *others):
+        """Include the ranges of other accumulators into this one.
+
+        Args:
+            *others (RangeAccumulator): the accumulators to merge.
+
+        Returns:
+            The accumulator itself, to allow chaining of calls.
+
+        """
+        return self.update(*others)
+
+    def is_empty(self):
+        """Check whether any finite values have been seen so far."""
+        lower, upper = self._bounds()
+        return lower > upper
+
+    def range(self):
+        """Return the accumulated range as a pair ``(lower, upper)``.
+
+        Raises:
+            ValueError: if no finite values have been seen.
+
+        """
+        lower, upper = self._bounds()
+        if lower > upper:
+            raise ValueError("no data range specified")
+        return lower, upper
+
+    def _bounds(self):
+        # Read both values together, so that a concurrent update()
+        # cannot be seen half-way.
+        with self._lock:
+            return self.lower, self.upper
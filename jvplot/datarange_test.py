@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+
+import threading
+
+import pytest
+
+import numpy as np
+
+from . import datarange
+
+
+def test_finite_range():
+    a, b = datarange.finite_range()
+    assert a > b
+
+    a, b = datarange.finite_range([np.nan, np.inf], None)
+    assert a > b
+
+    a, b = datarange.finite_range([1, (2, 3)], np.arange(4, 10))
+    assert a == 1 and b == 9
+
+    with pytest.raises(TypeError):
+        datarange.finite_range("fish")
+
+def test_accumulator():
+    acc = datarange.RangeAccumulator()
+    assert acc.is_empty()
+    with pytest.raises(ValueError):
+        acc.range()
+
+    acc.update([np.nan, -np.inf])
+    assert acc.is_empty()
+
+    acc.update(np.array([3, 1, 4]), 1)
+    acc.update([5, np.nan])
+    assert acc.range() == (1, 5)
+
+    other = datarange.RangeAccumulator(np.array([-2.0, 0.5]))
+    acc.merge(other, datarange.RangeAccumulator())
+    assert acc.range() == (-2, 5)
+
+    a, b = datarange.finite_range(acc, 7)
+    assert a == -2 and b == 7
+
+def test_accumulator_threads():
+    data = np.arange(10000, dtype=np.float64)
+    acc = datarange.RangeAccumulator()
+    chunks = np.array_split(data, 40)
+
+    def work(idx):
+        for chunk in chunks[idx::4]:
+            acc.update(chunk)
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert acc.range() == (0, 9999)
@@ -19,16 +19,130 @@ support for drawing text.
 
 """
 
-import numpy as np
+import math
 
 import cairocffi as cairo
 
 from . import color
+from . import datarange
 from . import errors
 from . import param
+from . import path
 from . import util
 
 
+class _GlyphCache:
+
+    """Shaped glyph runs and font metrics, shared by all devices of a plot.
+
+    Tick labels and other short strings are drawn many times in the
+    same font size.  For every combination of font size, text and
+    transformation matrix, the cache stores the glyph array needed for
+    ``cairo_show_glyphs()`` together with the text extents, so that
+    repeated strings are converted to glyphs only once.
+
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = {}
+
+    def _lookup(self, ctx, key, compute):
+        key = ctx.get_matrix().as_tuple()[:4] + key
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            entry = compute()
+            self._entries[key] = entry
+        return entry
+
+    def run(self, ctx, font_size, text):
+        """Get the glyphs and extents for `text`.
+
+        The font matrix of `ctx` must be set for `font_size`.  The
+        result is a tuple `(glyphs, n, extents)`, where `glyphs` is
+        a ``cairo_glyph_t`` array of length `n`, positioned relative
+        to the origin, and `extents` is as for ``ctx.text_extents()``.
+
+        """
+        def compute():
+            font = ctx.get_scaled_font()
+            glyphs = font.text_to_glyphs(0, 0, text, False)
+            return (cairo.ffi.new('cairo_glyph_t[]', glyphs), len(glyphs),
+                    font.text_extents(text))
+        return self._lookup(ctx, (font_size, text), compute)
+
+    def font_extents(self, ctx, font_size):
+        """Get ``ctx.font_extents()`` for the given font size."""
+        return self._lookup(ctx, (font_size, None), ctx.font_extents)
+
+
+class _StampCache:
+
+    """Rendered scatter plot markers, shared by all devices of a plot.
+
+    For raster image output, every marker is rendered once into a
+    small A8 image, which is then used as a mask to stamp the marker
+    at all points.  Point positions are quantized to `subpixels` steps per
+    pixel in each direction, and a separate image is kept for every
+    combination of transformation matrix, marker shape, marker size
+    and sub-pixel offset.
+
+    """
+
+    def __init__(self, subpixels=4, max_size=1024):
+        self.subpixels = subpixels
+        self.max_size = max_size
+        self._entries = {}
+
+    def radius(self, matrix, size):
+        """Get the distance from the marker centre to the border of the
+        marker images, in pixels.
+
+        """
+        xx, yx, xy, yy = matrix.as_tuple()[:4]
+        scale = max(math.hypot(xx, yx), math.hypot(xy, yy))
+        # the corners of a triangle are .78*size away from the centre
+        return int(math.ceil(.8 * size * scale)) + 2
+
+    def get(self, matrix, shape, size, qx, qy):
+        """Get the marker image for the sub-pixel offset `(qx, qy)`.
+
+        The result is an A8 image surface of size ``2*r x 2*r``, where
+        `r` is given by :py:meth:`radius`, with the marker centre at
+        pixel position ``(r + qx/subpixels, r + qy/subpixels)``.
+
+        """
+        key = matrix.as_tuple()[:4] + (shape, size, qx, qy)
+        surface = self._entries.get(key)
+        if surface is None:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            surface = self._render(matrix, shape, size, qx, qy)
+            self._entries[key] = surface
+        return surface
+
+    def _render(self, matrix, shape, size, qx, qy):
+        r = self.radius(matrix, size)
+        surface = cairo.ImageSurface(cairo.FORMAT_A8, 2*r, 2*r)
+        ctx = cairo.Context(surface)
+        xx, yx, xy, yy = matrix.as_tuple()[:4]
+        q = self.subpixels
+        ctx.set_matrix(cairo.Matrix(xx, yx, xy, yy, r + qx/q, r + qy/q))
+        if shape == 'round':
+            ctx.set_line_cap(cairo.LINE_CAP_ROUND)
+            ctx.set_line_width(size)
+            ctx.move_to(0, 0)
+            ctx.close_path()
+            ctx.stroke()
+        else:
+            path.append(ctx, path.markers([0], [0], shape, size))
+            ctx.fill()
+        surface.flush()
+        return surface
+
+
 class Device:
 
     """A graphics device to draw a plot on.
@@ -59,6 +173,19 @@ class Device:
             style = param.update(style, parent_style=parent.style)
         self.style = style
 
+        # If all drawing ends up on a pixel grid, `_pixel_res` is the
+        # resolution of the grid in pixels per inch, otherwise `None`.
+        # This is set by plot.Plot for raster image outputs, since the
+        # Cairo target can be a recording surface also in this case.
+        if parent is None:
+            self._glyphs = _GlyphCache()
+            self._stamps = _StampCache()
+            self._pixel_res = None
+        else:
+            self._glyphs = parent._glyphs
+            self._stamps = parent._stamps
+            self._pixel_res = parent._pixel_res
+
         if ctx is not None:
             ctx.set_line_join(cairo.LINE_JOIN_ROUND)
             ctx.set_line_cap(cairo.LINE_CAP_ROUND)
@@ -135,6 +262,8 @@ class Device:
             return util.parse_dash_pattern(value, self.res)
         if info[0] == 'str':
             return str(value)
+        if info[0] == 'int':
+            return int(value)
         raise NotImplementedError("parameter type '%s'" % info[0])
 
     def debug_style(self, *, style=None):
@@ -212,7 +341,7 @@ class Device:
         self.ctx.save()
         self.ctx.set_font_matrix(
             cairo.Matrix(font_size, 0, 0, -font_size, 0, 0))
-        ext = self.ctx.text_extents(text)
+        _, _, ext = self._glyphs.run(self.ctx, font_size, text)
         self.ctx.restore()
         return ext[2]
 
@@ -226,18 +355,81 @@ class Device:
         self.ctx.save()
         self.ctx.set_font_matrix(
             cairo.Matrix(font_size, 0, 0, -font_size, 0, 0))
-        ext = self.ctx.font_extents()
+        ext = self._glyphs.font_extents(self.ctx, font_size)
         self.ctx.restore()
         return ext[0] + ext[1]
 
-    def _draw_text(self, x, y, text, font_size, *, col=None, bg_col=None,
-                   horizontal_align="start", vertical_align="baseline",
-                   rotate=0, padding=["1pt", "3pt"], ctx=None):
+    def _text_padding(self, padding):
         padding = util.check_vec(padding, 4, True)
         p_top = util.convert_dim(padding[0], self.res, self.rect[3])
         p_right = util.convert_dim(padding[1], self.res, self.rect[2])
         p_bottom = util.convert_dim(padding[2], self.res, self.rect[3])
         p_left = util.convert_dim(padding[3], self.res, self.rect[2])
+        return p_top, p_right, p_bottom, p_left
+
+    def _text_y_offset(self, vertical_align, n_lines, font_ext, baseline_skip):
+        ascent, descent, line_height, _, _ = font_ext
+        if vertical_align == "baseline":
+            return 0
+        elif vertical_align == "top":
+            return -ascent
+        elif vertical_align == "bottom":
+            return descent
+        elif vertical_align == "center":
+            return (descent - ascent) / 2 + (n_lines - 1) * baseline_skip / 2
+        return util.convert_dim(vertical_align, self.res, line_height)
+
+    def _text_x_offset(self, horizontal_align, ext):
+        if horizontal_align == "start":
+            return 0
+        elif horizontal_align == "end":
+            return -ext[4]
+        elif horizontal_align == "left":
+            return -ext[0]
+        elif horizontal_align == "right":
+            return -ext[0] - ext[2]
+        elif horizontal_align == "center":
+            return -ext[0] - .5 * ext[2]
+        return util.convert_dim(horizontal_align, self.res, ext[2])
+
+    def _text_box(self, text, font_size, *, horizontal_align="start",
+                  vertical_align="baseline", padding=["1pt", "3pt"]):
+        """Get the area covered by a text and its background.
+
+        The result is a tuple ``(left, bottom, right, top)`` giving the
+        bounding box of the background rectangles drawn by
+        :py:meth:`_draw_text` for unrotated text, relative to the text
+        position.
+
+        """
+        p_top, p_right, p_bottom, p_left = self._text_padding(padding)
+        lines = text.splitlines()
+        baseline_skip = 1.2 * font_size
+
+        ctx = self.ctx
+        ctx.save()
+        ctx.set_font_matrix(
+            cairo.Matrix(font_size, 0, 0, -font_size, 0, 0))
+        font_ext = self._glyphs.font_extents(ctx, font_size)
+        y_offs = self._text_y_offset(vertical_align, len(lines), font_ext,
+                                     baseline_skip)
+        left = bottom = math.inf
+        right = top = -math.inf
+        for line in lines:
+            _, _, ext = self._glyphs.run(ctx, font_size, line)
+            x_offs = self._text_x_offset(horizontal_align, ext)
+            left = min(left, ext[0] + x_offs - p_left)
+            right = max(right, ext[0] + x_offs + ext[2] + p_right)
+            bottom = min(bottom, ext[1] + y_offs - p_bottom)
+            top = max(top, ext[1] + y_offs + ext[3] + p_top)
+            y_offs -= baseline_skip
+        ctx.restore()
+        return left, bottom, right, top
+
+    def _draw_text(self, x, y, text, font_size, *, col=None, bg_col=None,
+                   horizontal_align="start", vertical_align="baseline",
+                   rotate=0, padding=["1pt", "3pt"], ctx=None):
+        p_top, p_right, p_bottom, p_left = self._text_padding(padding)
 
         lines = text.splitlines()
         baseline_skip = 1.2 * font_size
@@ -247,32 +439,16 @@ class Device:
         ctx.set_font_matrix(
             cairo.Matrix(font_size, 0, 0, -font_size, 0, 0))
 
-        ascent, descent, line_height, _, _ = ctx.font_extents()
-        if vertical_align == "baseline":
-            y_offs = 0
-        elif vertical_align == "top":
-            y_offs = -ascent
-        elif vertical_align == "bottom":
-            y_offs = descent
-        elif vertical_align == "center":
-            y_offs = (descent - ascent) / 2 + (len(lines) - 1) * baseline_skip / 2
-        else:
-            y_offs = util.convert_dim(vertical_align, self.res, line_height)
+        font_ext = self._glyphs.font_extents(ctx, font_size)
+        y_offs = self._text_y_offset(vertical_align, len(lines), font_ext,
+                                     baseline_skip)
 
         for i, line in enumerate(lines):
-            ext = ctx.text_extents(line)
-            if horizontal_align == "start":
-                x_offs = 0
-            elif horizontal_align == "end":
-                x_offs = -ext[4]
-            elif horizontal_align == "left":
-                x_offs = -ext[0]
-            elif horizontal_align == "right":
-                x_offs = -ext[0] - ext[2]
-            elif horizontal_align == "center":
-                x_offs = -ext[0] - .5 * ext[2]
-            else:
-                x_offs = util.convert_dim(horizontal_align, self.res, ext[2])
+            ctx.save()
+            ctx.rotate(rotate)
+            glyphs, n_glyphs, ext = self._glyphs.run(ctx, font_size, line)
+            ctx.restore()
+            x_offs = self._text_x_offset(horizontal_align, ext)
 
             if bg_col is not None and bg_col[3] > 0:
                 ctx.save()
@@ -293,7 +469,11 @@ class Device:
             ctx.move_to(x, y)
             ctx.rotate(rotate)
             ctx.rel_move_to(x_offs, y_offs)
-            ctx.show_text(line)
+            cx, cy = ctx.get_current_point()
+            ctx.translate(cx, cy)
+            _show_glyphs(ctx, glyphs, n_glyphs)
+            ctx.translate(-cx, -cy)
+            ctx.new_path()
 
             y_offs -= baseline_skip
 
@@ -307,54 +487,19 @@ class Device:
             *args: All arguments are flattened.  The flattened version
                 must consists of numeric values, and the range of the
                 collection of all these numbers is returned.
+                Arguments can also be
+                :py:class:`jvplot.datarange.RangeAccumulator` objects.
 
         """
-        lower = np.inf
-        upper = -np.inf
-        for arg in args:
-            # ignore default values for unset parameters
-            if arg is None:
-                continue
-
-            # numbers are easy
-            if isinstance(arg, (float, int)):
-                if not np.isfinite(arg):
-                    continue
-                if arg < lower:
-                    lower = arg
-                if arg > upper:
-                    upper = arg
-                continue
-
-            # try whether numpy can deal with `arg`
-            try:
-                aa = np.array(arg).flatten()
-                aa = aa[np.isfinite(aa)]
-                a = np.min(aa)
-                b = np.max(aa)
-            except (ValueError, TypeError):
-                a = None
-            if a is not None:
-                if a < lower:
-                    lower = a
-                if b > upper:
-                    upper = b
-                continue
-
-            if not isinstance(arg, str):
-                # try whether `arg` is iterable
-                try:
-                    for a2 in arg:
-                        a, b = Device.data_range(a2)
-                        if a < lower:
-                            lower = a
-                        if b > upper:
-                            upper = b
-                    continue
-                except TypeError:
-                    pass
-            raise TypeError(f"invalid data range {arg!r}")
-
+        lower, upper = datarange.finite_range(*args)
         if lower > upper:
             raise ValueError("no data range specified")
         return lower, upper
+
+
+def _show_glyphs(ctx, glyphs, n_glyphs):
+    # The cached ``cairo_glyph_t`` array is passed to Cairo directly,
+    # since ctx.show_glyphs() would convert the glyphs on every call.
+    # This is a separate function, so that the profiler can time it.
+    cairo.cairo.cairo_show_glyphs(path.pointer(ctx), glyphs, n_glyphs)
+    ctx._check_status()
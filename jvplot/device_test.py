@@ -61,3 +61,24 @@ def test_data_range():
 
     with pytest.raises(TypeError):
         data_range("fish")
+
+def test_glyph_cache():
+    with plot.Plot("/dev/null", "3in", "2in") as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1))
+        assert ax._glyphs is pl._glyphs
+
+        w1 = pl.text_width("0.5", 10)
+        n = len(pl._glyphs._entries)
+        w2 = ax.text_width("0.5", 10)
+        assert w1 == w2 > 0
+        assert len(pl._glyphs._entries) == n
+        assert pl.text_width("0.55", 10) > w1
+        assert pl.text_width("0.5", 20) > w1
+
+        pl.ctx.save()
+        pl.ctx.set_font_matrix(plot.cairo.Matrix(10, 0, 0, -10, 0, 0))
+        assert pl.font_height(10) == pytest.approx(sum(
+            pl.ctx.font_extents()[:2]))
+        pl.ctx.restore()
+
+        ax.draw_text("a\nb", .5, .5)
@@ -41,6 +41,8 @@ DEFAULT = {
     'hist_col': ('col', '$line_col', 'line color for histogram boxes'),
     'hist_fill_col': ('col', '#CCC', 'fill color for histogram bars'),
     'hist_lw': ('dim', '$lw_thin', 'line width for histogram bars'),
+    'hist_separators': ('bool', False, 'whether to draw lines between the bins of step histograms'),
+    'hist_step': ('bool', False, 'whether to draw the histogram outline as a single step path'),
     'line_col': ('col', '$fg_col', 'line color'),
     'line_dash': ('dash', 'none', 'line dash pattern'),
     'lw': ('dim', '$lw_medium', 'line width'),
@@ -58,10 +60,20 @@ DEFAULT = {
     'padding_right': ('width', '$padding', 'viewport right padding'),
     'padding_top': ('height', '$padding', 'viewport top padding'),
     'plot_col': ('col', '$line_col', 'plot line color'),
+    'plot_data_coords': ('bool', False, 'whether to construct plot paths in data coordinates, using a Cairo transformation'),
     'plot_lw': ('dim', '$lw', 'line width for plots'),
+    'plot_pick': ('bool', False, 'whether to record plotted points for Axes.pick()'),
     'plot_point_col': ('col', 'inherit', 'point color for scatter plots'),
+    'plot_point_dedup': ('dim', 0, 'grid spacing for merging scatter plot points drawn at the same position (0 disables merging)'),
+    'plot_point_raster': ('bool', False, 'whether to draw scatter plots as an image, combining overlapping points of the same color and size exactly'),
     'plot_point_separate': ('bool', False, 'whether to draw points in a scatter plot individually'),
+    'plot_point_shape': ('str', 'round', 'marker shape for scatter plots: round, square, triangle or cross'),
     'plot_point_size': ('dim', 'inherit', 'point size for scatter plots'),
+    'polygon_bg': ('col', '$rect_bg', 'fill color for polygons'),
+    'polygon_fg': ('col', '$rect_fg', 'line color for polygons'),
+    'polygon_lw': ('dim', '$rect_lw', 'line width for polygons'),
+    'raster_res': ('int', 0, 'resolution for rasterized plot elements, in pixels per inch (0 means the resolution of raster image output, or 300 for vector output)'),
+    'raster_threshold': ('int', 0, 'number of points or vertices above which plot elements are rasterized in vector output (0 means never)'),
     'rect_bg': ('col', '$bg_col', 'fill color for rectangles'),
     'rect_fg': ('col', '$fg_col', 'line color for rectangles'),
     'rect_lw': ('dim', '$lw_medium', 'line width for rectangles'),
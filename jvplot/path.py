@@ -0,0 +1,297 @@
+# path.py - construct Cairo paths from NumPy arrays
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Bulk Path Construction
+----------------------
+
+Calling the Cairo path functions like ``ctx.line_to()`` once per
+vertex is slow for large data sets.  The functions in this module
+instead build the binary representation of a Cairo path (an array of
+``cairo_path_data_t`` records) using NumPy, and then add the complete
+path to a drawing context using a single call to
+``cairo_append_path()``.
+
+Path data is stored in a float64 array with two columns.  Each row
+corresponds to one ``cairo_path_data_t`` record: either a point, or
+a header where the first two 32-bit integers give the element type and
+the number of records of the element.
+
+"""
+
+import numpy as np
+
+import cairocffi as cairo
+
+
+# The outlines of the marker shapes for :py:func:`markers`.  For size
+# 1, all shapes have area pi/4, the area of a dot of diameter 1.
+MARKERS = {
+    'square': np.sqrt(np.pi) / 4 * np.array([
+        (-1, -1), (1, -1), (1, 1), (-1, 1)]),
+    'triangle': np.sqrt(np.pi / np.sqrt(27)) * np.array([
+        (0, 1), (-np.sqrt(3) / 2, -.5), (np.sqrt(3) / 2, -.5)]),
+    'cross': np.sqrt(np.pi / 20) / 2 * np.array([
+        (-1, -3), (1, -3), (1, -1), (3, -1), (3, 1), (1, 1),
+        (1, 3), (-1, 3), (-1, 1), (-3, 1), (-3, -1), (-1, -1)]),
+}
+
+
+def encode(x, y, move, close):
+    """Convert a list of vertices into Cairo path data.
+
+    Args:
+        x (array with ``shape=(n,)``): horizontal vertex coordinates.
+        y (array with ``shape=(n,)``): vertical vertex coordinates.
+        move (bool array with ``shape=(n,)``): which vertices start
+            a new sub-path.  All other vertices are connected to the
+            previous vertex by a straight line.
+        close (bool array with ``shape=(n,)``): after which vertices
+            the current sub-path is closed.
+
+    Returns:
+        The path data, in the format described above.
+
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    n = len(x)
+    move = np.broadcast_to(np.asarray(move, dtype=bool), (n,))
+    close = np.broadcast_to(np.asarray(close, dtype=bool), (n,))
+
+    n_close = np.cumsum(close)
+    pos = 2 * np.arange(n)
+    pos[1:] += n_close[:-1]
+    m = 2*n + (int(n_close[-1]) if n > 0 else 0)
+
+    data = np.empty((m, 2), dtype=np.float64)
+    hdr = data.view(np.int32)
+    hdr[pos, 0] = np.where(move, cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO)
+    hdr[pos, 1] = 2
+    data[pos+1, 0] = x
+    data[pos+1, 1] = y
+    cpos = pos[close] + 2
+    hdr[cpos, 0] = cairo.PATH_CLOSE_PATH
+    hdr[cpos, 1] = 1
+    return data
+
+
+def append(ctx, data):
+    """Append path data to the current path of a Cairo context.
+
+    Args:
+        ctx (cairocffi.Context): The drawing context.
+        data (array): The path data, as returned by :py:func:`encode`.
+
+    """
+    if len(data) == 0:
+        return
+    data = np.ascontiguousarray(data, dtype=np.float64)
+    ffi = cairo.ffi
+    path = ffi.new('cairo_path_t *', {
+        'status': cairo.STATUS_SUCCESS,
+        'data': ffi.cast('cairo_path_data_t *', ffi.from_buffer(data)),
+        'num_data': len(data),
+    })
+    cairo.cairo.cairo_append_path(pointer(ctx), path)
+    ctx._check_status()
+
+
+def pointer(obj):
+    """Get the C pointer wrapped by a cairocffi object.
+
+    This is needed to call Cairo functions which are not exposed by
+    cairocffi, or to call them without the overhead of the Python
+    wrappers.  cairocffi does not document this attribute, so all
+    uses go through this function.
+
+    Args:
+        obj: A cairocffi object, *e.g.* a :py:class:`cairocffi.Context`
+            or a :py:class:`cairocffi.Surface`.
+
+    """
+    return obj._pointer
+
+
+def rectangles(x0, y0, x1, y1):
+    """Construct the path data for a list of rectangles.
+
+    The resulting path is the same as for calling
+    ``ctx.rectangle(x0[i], y0[i], x1[i]-x0[i], y1[i]-y0[i])`` for
+    every ``i``.
+
+    Args:
+        x0 (array): the horizontal coordinates of the first corners.
+        y0 (array): the vertical coordinates of the first corners.
+        x1 (array): the horizontal coordinates of the opposite corners.
+        y1 (array): the vertical coordinates of the opposite corners.
+
+    """
+    x = np.stack([x0, x1, x1, x0], axis=-1)
+    y = np.stack([y0, y0, y1, y1], axis=-1)
+    corner = np.arange(x.size) % 4
+    return encode(x, y, corner == 0, corner == 3)
+
+
+def dots(x, y):
+    """Construct the path data for a collection of points.
+
+    Every point is represented by a closed sub-path of length zero,
+    which is shown as a dot when stroked with round line caps.
+    Points where at least one of the coordinates is ``nan`` are
+    ignored.
+
+    Args:
+        x (array with ``shape=(n,)``): horizontal coordinates.
+        y (array with ``shape=(n,)``): vertical coordinates.
+
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if not np.all(valid):
+        x, y = x[valid], y[valid]
+    return encode(x, y, True, True)
+
+
+def markers(x, y, shape, size):
+    """Construct the path data for a collection of filled markers.
+
+    The outline of the marker is built once and then copied to every
+    point.  The markers have the same area as a round dot of diameter
+    `size`, and are meant to be filled using the non-zero winding
+    rule.  Points where at least one of the coordinates is ``nan``
+    are ignored.
+
+    Args:
+        x (array with ``shape=(n,)``): horizontal coordinates.
+        y (array with ``shape=(n,)``): vertical coordinates.
+        shape (str): the marker shape, one of the keys of
+            :py:data:`MARKERS`.
+        size (number): the diameter of the corresponding round dot.
+
+    """
+    try:
+        outline = MARKERS[shape]
+    except KeyError:
+        raise ValueError("unknown marker shape %r" % shape) from None
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if not np.all(valid):
+        x, y = x[valid], y[valid]
+
+    k = len(outline)
+    first = np.arange(k) == 0
+    tmpl = encode(outline[:, 0] * size, outline[:, 1] * size,
+                  first, first[::-1])
+    data = np.tile(tmpl, (len(x), 1)).reshape((len(x), len(tmpl), 2))
+    data[:, 1:2*k:2, 0] += x[:, None]
+    data[:, 1:2*k:2, 1] += y[:, None]
+    return data.reshape((-1, 2))
+
+
+def runs(mask):
+    """Find the runs of consecutive ``True`` values in a boolean array.
+
+    Args:
+        mask (bool array): the array to examine.
+
+    Returns:
+        Two integer arrays `starts` and `ends`, such that the runs are
+        ``mask[starts[k]:ends[k]]``.
+
+    """
+    m = np.zeros(len(mask) + 2, dtype=np.int8)
+    m[1:-1] = mask
+    d = np.diff(m)
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1)
+
+
+def _check_offsets(offsets, n):
+    """Check that `offsets` splits `n` vertices into consecutive pieces.
+
+    Returns the offsets as an integer array.
+
+    """
+    offsets = np.asarray(offsets)
+    if len(offsets.shape) != 1 or len(offsets) < 1 or offsets[0] != 0 \
+            or offsets[-1] != n or np.any(offsets[1:] < offsets[:-1]):
+        raise ValueError('invalid offsets array')
+    return offsets.astype(np.intp)
+
+
+def _pieces(x, y, offsets, closed):
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    n = len(x)
+    if len(y) != n:
+        tmpl = 'x and y have incompatible lengths: %d != %d'
+        raise ValueError(tmpl % (n, len(y)))
+
+    valid = ~(np.isnan(x) | np.isnan(y))
+    first = np.zeros(n + 1, dtype=bool)
+    if offsets is None:
+        first[[0, n]] = True
+    else:
+        first[_check_offsets(offsets, n)] = True
+    last = first[1:]
+    first = first[:-1]
+
+    # A new sub-path starts at every valid vertex which is at the
+    # start of a piece or follows an invalid vertex.
+    prev_valid = np.zeros(n, dtype=bool)
+    prev_valid[1:] = valid[:-1]
+    next_valid = np.zeros(n, dtype=bool)
+    next_valid[:-1] = valid[1:]
+    start = valid & (first | ~prev_valid)
+    end = valid & (last | ~next_valid)
+
+    idx = np.flatnonzero(valid)
+    if closed:
+        return encode(x[idx], y[idx], start[idx], end[idx])
+
+    # isolated vertices are drawn as points, by repeating the vertex
+    counts = 1 + (start[idx] & end[idx])
+    rep = np.repeat(idx, counts)
+    is_copy = np.zeros(len(rep), dtype=bool)
+    is_copy[1:] = rep[1:] == rep[:-1]
+    return encode(x[rep], y[rep], start[rep] & ~is_copy, False)
+
+
+def lines(x, y, offsets=None):
+    """Construct the path data for a collection of polygonal lines.
+
+    Vertices where at least one of the coordinates is ``nan`` are
+    ignored and the line is interrupted where such vertices occur.
+    Lines which consist of a single vertex are drawn as points.
+
+    Args:
+        x (array with ``shape=(n,)``): horizontal vertex coordinates.
+        y (array with ``shape=(n,)``): vertical vertex coordinates.
+        offsets (integer array, optional): If given, the lines are
+            ``x[offsets[k]:offsets[k+1]]``, ``y[offsets[k]:offsets[k+1]]``
+            for ``k = 0, ..., len(offsets)-2``.  Otherwise all
+            vertices form a single line.
+
+    """
+    return _pieces(x, y, offsets, False)
+
+
+def polygons(x, y, offsets=None):
+    """Construct the path data for a collection of closed polygons.
+
+    The arguments are the same as for :py:func:`lines`.  Every
+    resulting sub-path is closed.
+
+    """
+    return _pieces(x, y, offsets, True)
@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+
+import numpy as np
+import pytest
+
+import cairocffi as cairo
+
+from . import path
+
+
+def _decode(data):
+    """Convert path data back into a list of (type, points) pairs."""
+    hdr = data.view(np.int32)
+    res = []
+    i = 0
+    while i < len(data):
+        tp, length = hdr[i, 0], hdr[i, 1]
+        res.append((tp, [tuple(p) for p in data[i+1:i+length]]))
+        i += length
+    return res
+
+def test_encode():
+    data = path.encode([1, 2, 3, 4], [5, 6, 7, 8],
+                       [True, False, True, False],
+                       [False, True, False, False])
+    assert _decode(data) == [
+        (cairo.PATH_MOVE_TO, [(1, 5)]),
+        (cairo.PATH_LINE_TO, [(2, 6)]),
+        (cairo.PATH_CLOSE_PATH, []),
+        (cairo.PATH_MOVE_TO, [(3, 7)]),
+        (cairo.PATH_LINE_TO, [(4, 8)]),
+    ]
+
+    data = path.encode([], [], [], [])
+    assert data.shape == (0, 2)
+
+def test_rectangles():
+    data = path.rectangles(np.array([0, 10]), np.array([1, 11]),
+                           np.array([2, 12]), np.array([3, 13]))
+    items = _decode(data)
+    assert len(items) == 10
+    assert items[0] == (cairo.PATH_MOVE_TO, [(0, 1)])
+    assert items[2] == (cairo.PATH_LINE_TO, [(2, 3)])
+    assert items[3] == (cairo.PATH_LINE_TO, [(0, 3)])
+    assert items[4] == (cairo.PATH_CLOSE_PATH, [])
+    assert items[5] == (cairo.PATH_MOVE_TO, [(10, 11)])
+
+def test_append():
+    surface = cairo.RecordingSurface(cairo.CONTENT_COLOR, None)
+    ctx = cairo.Context(surface)
+    data = path.rectangles(np.array([0.0]), np.array([0.0]),
+                           np.array([1.0]), np.array([2.0]))
+    path.append(ctx, data)
+    expected = cairo.Context(surface)
+    expected.rectangle(0, 0, 1, 2)
+    assert ctx.copy_path() == expected.copy_path()
+
+def test_lines():
+    nan = np.nan
+    items = _decode(path.lines([1, 2, nan, 4, 5, 6], [1, 2, 3, 4, nan, 6]))
+    assert [tp for tp, _ in items] == [
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO,
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, # single vertex
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, # single vertex
+    ]
+    assert items[3] == (cairo.PATH_LINE_TO, [(4, 4)])
+
+    items = _decode(path.lines([1, 2, 3, 4], [1, 2, 3, 4], [0, 1, 1, 4]))
+    assert [tp for tp, _ in items] == [
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO,
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, cairo.PATH_LINE_TO,
+    ]
+
+def test_polygons():
+    items = _decode(path.polygons([1, 2, 3, 4, 5], [1, 2, 3, 4, 5], [0, 3, 5]))
+    assert [tp for tp, _ in items] == [
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, cairo.PATH_LINE_TO,
+        cairo.PATH_CLOSE_PATH,
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, cairo.PATH_CLOSE_PATH,
+    ]
+
+def test_runs():
+    starts, ends = path.runs(np.array([1, 1, 0, 1, 0, 0, 1], dtype=bool))
+    assert list(starts) == [0, 3, 6]
+    assert list(ends) == [2, 4, 7]
+
+def test_dots():
+    items = _decode(path.dots([1, np.nan, 3], [4, 5, 6]))
+    assert items == [
+        (cairo.PATH_MOVE_TO, [(1, 4)]),
+        (cairo.PATH_CLOSE_PATH, []),
+        (cairo.PATH_MOVE_TO, [(3, 6)]),
+        (cairo.PATH_CLOSE_PATH, []),
+    ]
+
+def test_markers():
+    items = _decode(path.markers([1, np.nan, 3], [4, 5, 6], 'square', 2))
+    assert [tp for tp, _ in items] == [
+        cairo.PATH_MOVE_TO, cairo.PATH_LINE_TO, cairo.PATH_LINE_TO,
+        cairo.PATH_LINE_TO, cairo.PATH_CLOSE_PATH,
+    ] * 2
+    a = np.sqrt(np.pi) / 2
+    assert items[0][1][0] == pytest.approx((1 - a, 4 - a))
+    assert items[7][1][0] == pytest.approx((3 + a, 6 + a))
+
+    for shape, outline in path.MARKERS.items():
+        x, y = outline[:, 0], outline[:, 1]
+        area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) / 2
+        assert area == pytest.approx(np.pi / 4)
+
+    with pytest.raises(ValueError):
+        path.markers([0], [0], 'star', 1)
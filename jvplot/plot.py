@@ -18,11 +18,122 @@ The Plot Class
 This module provides the main entry point for the JvPlot package.
 """
 
+import collections
+import concurrent.futures
 import os.path
+import sys
+import threading
+
+import numpy as np
 
 import cairocffi as cairo
 
-from . import canvas, util, param
+from . import canvas, util, param, png, profile as _profile
+
+_background = None
+_background_lock = threading.Lock()
+
+def _background_executor():
+    global _background
+    with _background_lock:
+        if _background is None:
+            _background = concurrent.futures.ThreadPoolExecutor(
+                thread_name_prefix="jvplot")
+        return _background
+
+# 'image' is used internally for plots which are only kept in memory
+_RASTER_TYPES = ('png', 'npy', 'rgba', 'image')
+_FILE_TYPES = ('pdf', 'ps', 'eps', 'png', 'npy', 'rgba')
+
+def _file_type(file_name):
+    if file_name is None:
+        return 'image'
+    _, ext = os.path.splitext(file_name)
+    if ext:
+        ext = ext[1:]
+    elif file_name == "/dev/null":
+        ext = None
+    else:
+        raise ValueError('file name "%s" lacks an extension' % file_name)
+    if ext is not None and ext not in _FILE_TYPES:
+        raise ValueError('unsupported file type "%s"' % ext)
+    return ext
+
+def _base_res(ext, res):
+    if ext in _RASTER_TYPES:
+        return res
+    return 72
+
+def _open_surface(file_name, ext, w_dev, h_dev):
+    if ext == 'pdf':
+        surface = cairo.PDFSurface(file_name, w_dev, h_dev)
+    elif ext == 'ps':
+        surface = cairo.PSSurface(file_name, w_dev, h_dev)
+    elif ext == 'eps':
+        surface = cairo.PSSurface(file_name, w_dev, h_dev)
+        surface.set_eps(True)
+    elif ext in _RASTER_TYPES:
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w_dev, h_dev)
+    else:
+        surface = cairo.RecordingSurface(cairo.CONTENT_COLOR,
+                                         (0, 0, w_dev, h_dev))
+    return surface
+
+class _SurfaceMemory:
+
+    """Expose the pixel memory of an image surface to NumPy.
+
+    Arrays created from this object keep a reference to it, and thus
+    to the surface, so that the memory stays valid for as long as
+    any of the arrays is in use.
+
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+        data = np.frombuffer(surface.get_data(), dtype=np.uint8)
+        self.__array_interface__ = {
+            'version': 3,
+            'shape': data.shape,
+            'typestr': data.dtype.str,
+            'data': (data.ctypes.data, False),
+        }
+
+def _image_data(surface):
+    """Return a view of the pixel data of an image surface."""
+    surface.flush()
+    w = surface.get_width()
+    h = surface.get_height()
+    stride = surface.get_stride()
+    data = np.asarray(_SurfaceMemory(surface))
+    return data.reshape((h, stride))[:, :4*w].reshape((h, w, 4))
+
+def _image_rgb(surface):
+    """Return a view of the RGB values of a FORMAT_RGB24 image surface."""
+    data = _image_data(surface)
+    if sys.byteorder == "little":
+        # pixels are stored as native-endian 32 bit words 0xXXRRGGBB
+        return data[:, :, 2::-1]
+    return data[:, :, 1:]
+
+def _close_surface(surface, file_name, ext, compression=None):
+    if ext == 'png':
+        if compression is None:
+            surface.write_to_png(file_name)
+        else:
+            png.write(file_name, _image_rgb(surface), level=compression)
+    elif ext == 'npy':
+        np.save(file_name, _image_rgb(surface))
+    elif ext == 'rgba':
+        rgb = _image_rgb(surface)
+        rgba = np.empty(rgb.shape[:2] + (4,), dtype=np.uint8)
+        rgba[:, :, :3] = rgb
+        rgba[:, :, 3] = 255
+        rgba.tofile(file_name)
+    elif ext == 'image':
+        surface.flush()
+    else:
+        surface.finish()
 
 class Plot(canvas.Canvas):
 
@@ -30,15 +141,24 @@ class Plot(canvas.Canvas):
 
     """
 
-    def __init__(self, file_name, width, height=None, *, res=None, style={}):
+    def __init__(self, file_name, width, height=None, *, res=None, style={},
+                 compression=None, executor=None, tile_size=None,
+                 workers=None, profile=False):
         """Create a new plot.
 
         Args:
-            file_name (string): The name of the file the figure will be
-                stored in.  Any previously existing file with this name
-                will be overwritten.  The file name extension determines
-                the file type.  Available file types are `.pdf`, `.ps`,
-                `.eps` and `.png`.
+            file_name (string or list of strings): The name of the
+                file the figure will be stored in.  Any previously
+                existing file with this name will be overwritten.  The
+                file name extension determines the file type.  Available
+                file types are `.pdf`, `.ps`, `.eps` and `.png`, as well
+                as `.npy` (a NumPy array of shape ``(h, w, 3)``) and
+                `.rgba` (uncompressed 8 bit RGBA values, row by row).
+                If `file_name` is `None`, the image is only kept in
+                memory, see :py:meth:`pixels`.  If a list of file names
+                is given, the figure is recorded while it is drawn and
+                then written to every one of the files when the plot is
+                closed.
 
             width: The figure width.  This can either be a number to give
                 the width in device units (pixels), or a string including
@@ -50,23 +170,60 @@ class Plot(canvas.Canvas):
 
             res (number, optional): For raster image formats, `res`
                 specifies the device resolution in pixels per inch.
+                If several output files are given, this also gives the
+                resolution of PNG outputs; use :py:meth:`replay` to
+                write images at other resolutions.
 
             style (dict, optional): Default plot graphics values for the
                 figure.
 
+            compression (int, optional): The zlib compression level
+                for PNG output, from 0 (no compression, fastest) to 9
+                (smallest files).  If this is not set, Cairo's
+                built-in PNG encoder is used.
+
+            executor (optional): If set, the output files are written
+                in the background when the plot is closed, and
+                :py:meth:`close` returns a
+                :py:class:`concurrent.futures.Future`.  This can either
+                be an executor from :py:mod:`concurrent.futures`, or
+                `True` to use a thread pool shared by all plots.
+
+            tile_size (int, optional): If this is set, PNG images are
+                rendered in horizontal strips of `tile_size` pixel rows,
+                which are compressed and written to the file one after
+                another.  This limits the memory required for very large
+                images.  See also :py:meth:`write_tiles`.
+
+            workers (int, optional): The number of threads used to
+                render tiles, if `tile_size` is set.
+
+            profile (bool, optional): If true, record how much time is
+                spent in the different phases of drawing the figure.
+                Only calls made from the thread which creates the plot,
+                and from the thread which writes the output files, are
+                recorded.  Once the output files have been written, the
+                timings are available in the :py:attr:`profile`
+                attribute.
+
         """
 
+        self.profile = None
+        """If the plot was created with ``profile=True``, this is set to a
+        :py:class:`jvplot.profile.Report` once the output files have been
+        written."""
+        self._profiler = None
+
         self.file_name = file_name
         """The output file name, as given in the ``file_name`` argument of the
         ``plot.Plot`` constructor (read only)."""
 
-        _, ext = os.path.splitext(file_name)
-        if ext:
-            ext = ext[1:]
-        elif file_name == "/dev/null":
-            ext = None
+        if file_name is None or isinstance(file_name, str):
+            targets = [(file_name, _file_type(file_name))]
         else:
-            raise ValueError('file name "%s" lacks an extension' % file_name)
+            targets = [(name, _file_type(name)) for name in file_name]
+            if not targets:
+                raise ValueError("no output files given")
 
         if height is None:
             if width == "A4":
@@ -81,34 +238,26 @@ class Plot(canvas.Canvas):
                 height = width
 
         if res is None:
-            if ext == 'png':
+            if any(ext in _RASTER_TYPES for _, ext in targets):
                 res = 100
             else:
                 res = 72
-        if ext == 'png':
-            base_res = res
-        else:
-            base_res = 72
         w = int(util.convert_dim(width, res) + 0.5)
         h = int(util.convert_dim(height, res) + 0.5)
 
-        q = base_res / res
-        w_dev = int(w * q + .5)
-        h_dev = int(h * q + .5)
-        if ext == 'pdf':
-            surface = cairo.PDFSurface(file_name, w_dev, h_dev)
-        elif ext == 'ps':
-            surface = cairo.PSSurface(file_name, w_dev, h_dev)
-        elif ext == 'eps':
-            surface = cairo.PSSurface(file_name, w_dev, h_dev)
-            surface.set_eps(True)
-        elif ext == 'png':
-            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w_dev, h_dev)
-        elif ext is None:
-            surface = cairo.RecordingSurface(cairo.CONTENT_COLOR,
-                                             (0, 0, w_dev, h_dev))
+        if len(targets) == 1 and tile_size is None:
+            # draw directly onto the output surface
+            name, ext = targets[0]
+            q = _base_res(ext, res) / res
+            w_dev = int(w * q + .5)
+            h_dev = int(h * q + .5)
+            surface = _open_surface(name, ext, w_dev, h_dev)
+            direct_type = ext
         else:
-            raise ValueError('unsupported file type "%s"' % ext)
+            # record the figure, and replay it to all outputs on close
+            q = 1
+            surface = _open_surface(None, None, w, h)
+            direct_type = None
         ctx = cairo.Context(surface)
 
         # move the origin to the bottom left corner:
@@ -116,9 +265,37 @@ class Plot(canvas.Canvas):
         ctx.translate(0, -h)
 
         super().__init__(ctx, [0, 0, w, h], res=res, style=style)
+        if all(ext in _RASTER_TYPES for _, ext in targets):
+            self._pixel_res = res
         self.surface = surface
-        self.file_name = file_name
-        self.file_type = ext
+        file_type = targets[0][1]
+        self.file_type = None if file_type == 'image' else file_type
+        """The type of the (first) output file, as given by the file name
+        extension, *e.g.* ``"pdf"``.  This is `None` for the file name
+        "/dev/null" and for plots which are only kept in memory (read
+        only)."""
+        self._targets = targets
+        self._size = (w, h)
+        self._rec_scale = q
+        self._compression = compression
+        self._tile_size = tile_size
+        self._workers = workers
+        if executor is True:
+            executor = _background_executor()
+        self._executor = executor
+        self.future = None
+        """If the plot was created with an `executor`, this is set to the
+        :py:class:`concurrent.futures.Future` for writing the output
+        once the plot is closed."""
+        self._recording = surface if direct_type is None else None
+        self._image = surface if direct_type in _RASTER_TYPES else None
+
+        # Profiling starts only once nothing can fail any more, since
+        # the profiler instruments the drawing code for all plots
+        # until it is stopped in close().
+        if profile:
+            self._profiler = _profile.Profiler(all_threads=False)
+            self._profiler.start()
 
     def __str__(self):
         _, _, w, h = self.rect
@@ -129,10 +306,237 @@ class Plot(canvas.Canvas):
         """Close the plot and write all outstanding changes to the file.  The
         ``Plot`` object cannot be used any more after this call.
 
+        Returns:
+            If the plot was created with an `executor`, a
+            :py:class:`concurrent.futures.Future` which completes once
+            all output files have been written.  Otherwise `None`.
+
         """
         super().close()
-        if self.file_type == 'png':
-            self.surface.write_to_png(self.file_name)
-        else:
-            self.surface.finish()
+        surface = self.surface
         self.surface = None
+        if self._executor is None:
+            try:
+                self._finish(surface)
+            finally:
+                self._stop_profiler()
+        else:
+            self.future = self._executor.submit(self._finish_background,
+                                                surface)
+        return self.future
+
+    def _finish_background(self, surface):
+        # The profiler is stopped before the future completes, so that
+        # the report includes the "finish" phase and is available as
+        # soon as the future is done.
+        try:
+            if self._profiler is None:
+                self._finish(surface)
+            else:
+                with self._profiler._thread():
+                    self._finish(surface)
+        finally:
+            self._stop_profiler()
+
+    def _stop_profiler(self):
+        profiler = self._profiler
+        if profiler is not None:
+            self._profiler = None
+            profiler.stop()
+            self.profile = profiler.report()
+
+    def _finish(self, surface):
+        if self._recording is None:
+            name, ext = self._targets[0]
+            _close_surface(surface, name, ext, self._compression)
+            return
+        self._recording.flush()
+        for name, ext in self._targets:
+            if ext == 'image':
+                self._image = self._render(None, ext, None)
+            elif ext is not None:
+                self.replay(name)
+
+    def replay(self, file_name, res=None):
+        """Write a copy of the figure to another file.
+
+        This is only possible for plots which record the figure, *i.e.*
+        for plots with file name "/dev/null" or with several output
+        files.  The method can be used both before and after the plot
+        is closed.  No layout computations are repeated, the recorded
+        drawing operations are just rendered again.
+
+        Plot elements which are rasterized while drawing, *i.e.*
+        raster layers (see :py:meth:`jvplot.axes.Axes.raster_layer`),
+        line density images and point markers which are stamped onto
+        the pixel grid of a raster image plot, are recorded as bitmaps
+        at the resolution used when the plot was drawn.  If the figure
+        is replayed at a higher resolution, these bitmaps are only
+        scaled up.  To avoid this, create the plot with the resolution
+        of the largest output, or set the graphics parameter
+        ``raster_res`` for raster layers and line density images.
+
+        Args:
+            file_name (string): The name of the output file.  The file
+                name extension determines the file type, as for the
+                `file_name` argument of :py:class:`Plot`.
+            res (number, optional): For raster image formats, the
+                device resolution in pixels per inch.  The default is
+                to use the resolution of the plot.
+
+        """
+        if self._recording is None:
+            raise ValueError("the plot was not recorded")
+        ext = _file_type(file_name)
+        if ext is None:
+            return
+        if ext == 'png' and self._tile_size is not None:
+            self._write_strips(file_name, res)
+            return
+        surface = self._render(file_name, ext, res)
+        _close_surface(surface, file_name, ext, self._compression)
+
+    def _pixel_size(self, res):
+        w, h = self._size
+        q = res / self.res
+        return int(w * q + .5), int(h * q + .5)
+
+    def _render_tile(self, x, y, w, h, res):
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w, h)
+        ctx = cairo.Context(surface)
+        ctx.translate(-x, -y)
+        q = res / self.res / self._rec_scale
+        ctx.scale(q, q)
+        ctx.set_source_surface(self._recording, 0, 0)
+        ctx.paint()
+        surface.flush()
+        return surface
+
+    def _map_tiles(self, tiles, res, workers):
+        """Render the given tiles and yield the results in order.
+
+        At most ``2 * workers`` tiles are held in memory at any time.
+        """
+        if workers is None:
+            workers = self._workers
+        if not workers or workers <= 1:
+            for x, y, w, h in tiles:
+                yield self._render_tile(x, y, w, h, res)
+            return
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            pending = collections.deque()
+            for x, y, w, h in tiles:
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(self._render_tile,
+                                           x, y, w, h, res))
+            while pending:
+                yield pending.popleft().result()
+
+    def _write_strips(self, file_name, res):
+        if res is None:
+            res = self.res
+        w, h = self._pixel_size(res)
+        t = self._tile_size
+        strips = [(0, y, w, min(t, h - y)) for y in range(0, h, t)]
+        level = self._compression
+        if level is None:
+            level = 6
+        with open(file_name, "wb") as fd:
+            out = png.Writer(fd, w, h, level=level)
+            for surface in self._map_tiles(strips, res, None):
+                out.write_rows(_image_rgb(surface))
+                surface.finish()
+            out.close()
+
+    def write_tiles(self, pattern, tile_size, *, res=None, workers=None):
+        """Write the figure as a grid of separate PNG tiles.
+
+        This is only possible for plots which record the figure, see
+        :py:meth:`replay`.  Only the tiles currently being rendered are
+        kept in memory.  As for :py:meth:`replay`, rasterized plot
+        elements are only scaled up if `res` is larger than the
+        resolution of the plot.
+
+        Args:
+            pattern (string): The file name for the tiles.  This is
+                formatted using :py:meth:`str.format`, with the
+                keyword arguments `row` and `col` giving the tile
+                position, counted from the top left corner.  Example:
+                ``"tile-{row}-{col}.png"``.
+            tile_size (int or pair of ints): The width and height
+                of the tiles, in pixels.  The tiles at the right and
+                bottom edge of the image may be smaller.
+            res (number, optional): The device resolution in pixels
+                per inch.  The default is to use the resolution of
+                the plot.
+            workers (int, optional): The number of threads used to
+                render the tiles.
+
+        Returns:
+            The number of tile rows and columns, as a pair.
+
+        """
+        if self._recording is None:
+            raise ValueError("the plot was not recorded")
+        if res is None:
+            res = self.res
+        try:
+            tw, th = tile_size
+        except TypeError:
+            tw = th = tile_size
+        w, h = self._pixel_size(res)
+        tiles = []
+        names = []
+        for row, y in enumerate(range(0, h, th)):
+            for col, x in enumerate(range(0, w, tw)):
+                tiles.append((x, y, min(tw, w - x), min(th, h - y)))
+                names.append(pattern.format(row=row, col=col))
+        for name, surface in zip(names, self._map_tiles(tiles, res, workers)):
+            _close_surface(surface, name, 'png', self._compression)
+        return (h + th - 1) // th, (w + tw - 1) // tw
+
+    def _render(self, file_name, ext, res):
+        if res is None:
+            res = self.res
+        w, h = self._size
+        q = _base_res(ext, res) / self.res
+        surface = _open_surface(file_name, ext,
+                                int(w * q + .5), int(h * q + .5))
+        ctx = cairo.Context(surface)
+        q /= self._rec_scale
+        ctx.scale(q, q)
+        ctx.set_source_surface(self._recording, 0, 0)
+        ctx.paint()
+        return surface
+
+    def pixels(self, *, raw=False):
+        """Get the pixel values of a raster image plot.
+
+        The returned array is a view of the image memory used by Cairo,
+        no data is copied.  For plots which record the figure instead
+        of drawing onto an image, *e.g.* plots with several output
+        files, the figure is rendered at resolution :py:attr:`res` on
+        the first call of this method.  The array keeps the image
+        alive, so it remains valid after the plot has been closed and
+        deleted.
+
+        Args:
+            raw (bool, optional): By default, the method returns an
+                array of shape ``(h, w, 3)``, giving the red, green and
+                blue intensities of every pixel.  If `raw` is true, an
+                array of shape ``(h, w, 4)`` is returned, in the byte
+                order used by Cairo: on little-endian machines the
+                channels are blue, green, red and an unused byte.
+
+        Returns:
+            An array of type ``uint8``.
+
+        """
+        if self._image is None:
+            if self._recording is None:
+                raise ValueError("not a raster image plot")
+            self._image = self._render(None, 'image', None)
+        if raw:
+            return _image_data(self._image)
+        return _image_rgb(self._image)
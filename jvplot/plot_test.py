@@ -1,5 +1,8 @@
 #! /usr/bin/env python3
 
+import gc
+
+import numpy as np
 import pytest
 
 from . import plot
@@ -21,3 +24,89 @@ def test_plot_str():
     with plot.Plot("/dev/null", "5in", "3in") as pl:
         s = str(pl)
         assert "/dev/null" in s
+
+def test_plot_multiple_outputs(tmp_path):
+    names = [str(tmp_path / "fig.pdf"), str(tmp_path / "fig.png")]
+    with plot.Plot(names, "3in", "2in", res=50) as pl:
+        assert pl.file_type == "pdf"
+        pl.plot([1, 3, 2])
+    for name in names:
+        assert (tmp_path / name).stat().st_size > 0
+
+    big = str(tmp_path / "big.png")
+    pl.replay(big, res=100)
+    with open(big, "rb") as fd:
+        header = fd.read(24)
+    w = int.from_bytes(header[16:20], "big")
+    h = int.from_bytes(header[20:24], "big")
+    assert (w, h) == (300, 200)
+
+def test_plot_replay_requires_recording(tmp_path):
+    with plot.Plot(str(tmp_path / "fig.pdf"), "3in") as pl:
+        pass
+    with pytest.raises(ValueError):
+        pl.replay(str(tmp_path / "copy.pdf"))
+    assert pl.file_type == "pdf"
+    with plot.Plot(None, 10, 10) as pl:
+        assert pl.file_type is None
+
+def test_plot_background_png(tmp_path):
+    name = str(tmp_path / "fig.png")
+    pl = plot.Plot(name, 120, 80, compression=1, executor=True)
+    pl.plot([1, 3, 2])
+    future = pl.close()
+    assert future is pl.future
+    future.result()
+    with open(name, "rb") as fd:
+        assert fd.read(8) == b'\x89PNG\r\n\x1a\n'
+
+def test_plot_pixels(tmp_path):
+    with plot.Plot(None, 50, 40, style={'bg_col': 'red'}) as pl:
+        pass
+    pixels = pl.pixels()
+    assert pixels.shape == (40, 50, 3)
+    assert np.all(pixels == [255, 0, 0])
+    assert pl.pixels(raw=True).shape == (40, 50, 4)
+
+    name = str(tmp_path / "fig.npy")
+    rgba = str(tmp_path / "fig.rgba")
+    with plot.Plot([name, rgba], 50, 40, style={'bg_col': 'red'}) as pl:
+        pass
+    assert np.array_equal(np.load(name), pixels)
+    raw = np.fromfile(rgba, dtype=np.uint8).reshape(40, 50, 4)
+    assert np.all(raw == [255, 0, 0, 255])
+    assert np.array_equal(pl.pixels(), pixels)
+
+    # the pixel data stays valid after the plot is gone
+    with plot.Plot(None, 50, 40, style={'bg_col': 'blue'}) as pl:
+        pass
+    pixels = pl.pixels()
+    del pl
+    gc.collect()
+    assert np.all(pixels == [0, 0, 255])
+
+    with pytest.raises(ValueError):
+        plot.Plot(str(tmp_path / "fig.image"), 50, 40)
+
+def _draw_test_figure(pl):
+    x = np.linspace(0, 10, 200)
+    pl.plot(x, np.sin(x))
+
+def test_plot_tiles(tmp_path):
+    with plot.Plot(None, 230, 170) as pl:
+        _draw_test_figure(pl)
+    expected = pl.pixels().astype(int)
+
+    name = str(tmp_path / "strips.png")
+    with plot.Plot(name, 230, 170, tile_size=32, workers=3) as pl:
+        _draw_test_figure(pl)
+    img = plot.cairo.ImageSurface.create_from_png(name)
+    pixels = plot._image_rgb(img).astype(int)
+    assert pixels.shape == expected.shape
+    assert np.mean(np.abs(pixels - expected)) < 1
+
+    pattern = str(tmp_path / "tile-{row}-{col}.png")
+    rows, cols = pl.write_tiles(pattern, 100)
+    assert (rows, cols) == (2, 3)
+    img = plot.cairo.ImageSurface.create_from_png(pattern.format(row=1, col=2))
+    assert (img.get_width(), img.get_height()) == (30, 70)
@@ -0,0 +1,124 @@
+# png.py - write PNG image files
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""PNG Output
+----------
+
+Cairo's ``write_to_png()`` always uses the same compression settings.
+The functions in this module write PNG files from NumPy pixel arrays
+with a selectable zlib compression level, where 0 means no
+compression, 1 is fastest and 9 gives the smallest files.  Since zlib
+releases the global interpreter lock while compressing, images can
+be encoded in a background thread while the main thread continues
+drawing.
+
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+
+_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _chunk(fd, kind, data):
+    fd.write(struct.pack(">I", len(data)))
+    fd.write(kind)
+    fd.write(data)
+    fd.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+class Writer:
+
+    """Write a PNG file one block of rows at a time.
+
+    Args:
+        fd (file): A binary file object to write the image to.
+        width (int): The image width in pixels.
+        height (int): The image height in pixels.
+        alpha (bool, optional): Whether the image has an alpha channel.
+        level (int, optional): The zlib compression level, from 0 to 9.
+
+    """
+
+    def __init__(self, fd, width, height, *, alpha=False, level=6):
+        if not 0 <= level <= 9:
+            raise ValueError("invalid compression level %r" % level)
+        self.fd = fd
+        self.width = width
+        self.height = height
+        self.channels = 4 if alpha else 3
+        self.rows_left = height
+        self._z = zlib.compressobj(level)
+
+        fd.write(_SIGNATURE)
+        color_type = 6 if alpha else 2
+        _chunk(fd, b'IHDR', struct.pack(">IIBBBBB", width, height, 8,
+                                        color_type, 0, 0, 0))
+
+    def write_rows(self, pixels):
+        """Append rows to the image.
+
+        Args:
+            pixels (array): An array of ``uint8`` intensities with shape
+                ``(rows, width, channels)``, where the channels are RGB
+                or RGBA.
+
+        """
+        rows = pixels.shape[0]
+        if pixels.shape[1:] != (self.width, self.channels):
+            raise ValueError("pixel data has shape %s, expected (n, %d, %d)"
+                             % (pixels.shape, self.width, self.channels))
+        if rows > self.rows_left:
+            raise ValueError("too many rows")
+        self.rows_left -= rows
+
+        raw = np.empty((rows, 1 + self.width * self.channels), dtype=np.uint8)
+        raw[:, 0] = 0       # filter type "None"
+        raw[:, 1:] = pixels.reshape(rows, -1)
+        data = self._z.compress(raw)
+        if data:
+            _chunk(self.fd, b'IDAT', data)
+
+    def close(self):
+        """Write the end of the image.  This does not close `fd`."""
+        if self.rows_left > 0:
+            raise ValueError("%d rows missing" % self.rows_left)
+        _chunk(self.fd, b'IDAT', self._z.flush())
+        _chunk(self.fd, b'IEND', b'')
+
+
+def write(file_name, pixels, *, level=6, block_rows=256):
+    """Write a PNG image file.
+
+    Args:
+        file_name (str): The name of the output file.
+        pixels (array): An array of ``uint8`` intensities with shape
+            ``(height, width, 3)`` for RGB images or
+            ``(height, width, 4)`` for RGBA images.
+        level (int, optional): The zlib compression level, from 0 (no
+            compression) to 9 (best compression).
+        block_rows (int, optional): The number of rows to convert
+            at a time.
+
+    """
+    h, w, c = pixels.shape
+    if c not in (3, 4):
+        raise ValueError("pixel data must have 3 or 4 channels")
+    with open(file_name, "wb") as fd:
+        out = Writer(fd, w, h, alpha=(c == 4), level=level)
+        for i in range(0, h, block_rows):
+            out.write_rows(pixels[i:i+block_rows])
+        out.close()
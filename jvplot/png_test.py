@@ -0,0 +1,52 @@
+#! /usr/bin/env python3
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from . import png
+
+def _read(file_name):
+    with open(file_name, "rb") as fd:
+        data = fd.read()
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos = 8
+    chunks = []
+    while pos < len(data):
+        n, = struct.unpack(">I", data[pos:pos+4])
+        kind = data[pos+4:pos+8]
+        body = data[pos+8:pos+8+n]
+        crc, = struct.unpack(">I", data[pos+8+n:pos+12+n])
+        assert crc == zlib.crc32(body, zlib.crc32(kind))
+        chunks.append((kind, body))
+        pos += 12 + n
+    assert chunks[0][0] == b'IHDR' and chunks[-1][0] == b'IEND'
+    w, h, _, color_type, _, _, _ = struct.unpack(">IIBBBBB", chunks[0][1])
+    c = 4 if color_type == 6 else 3
+    raw = zlib.decompress(b''.join(body for kind, body in chunks
+                                   if kind == b'IDAT'))
+    raw = np.frombuffer(raw, dtype=np.uint8).reshape(h, 1 + w*c)
+    assert np.all(raw[:, 0] == 0)
+    return raw[:, 1:].reshape(h, w, c)
+
+@pytest.mark.parametrize("level", [0, 1, 9])
+def test_write(tmp_path, level):
+    rng = np.random.default_rng(1)
+    for c in [3, 4]:
+        pixels = rng.integers(0, 256, size=(37, 11, c), dtype=np.uint8)
+        name = str(tmp_path / ("img%d.png" % c))
+        png.write(name, pixels, level=level, block_rows=10)
+        assert np.array_equal(_read(name), pixels)
+
+def test_writer_errors(tmp_path):
+    with open(tmp_path / "x.png", "wb") as fd:
+        with pytest.raises(ValueError):
+            png.Writer(fd, 2, 2, level=10)
+        out = png.Writer(fd, 2, 2)
+        with pytest.raises(ValueError):
+            out.write_rows(np.zeros((1, 3, 3), dtype=np.uint8))
+        out.write_rows(np.zeros((1, 2, 3), dtype=np.uint8))
+        with pytest.raises(ValueError):
+            out.close()
@@ -0,0 +1,276 @@
+# profile.py - measure where the time is spent when drawing a plot
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Rendering Profiler
+------------------
+
+This module allows to measure how much time is spent in the different
+phases of drawing a figure.  Profiling can either be enabled for a
+single plot, using the ``profile`` argument of
+:py:class:`jvplot.plot.Plot`, or for arbitrary code using a
+:py:class:`Profiler` object as a context manager::
+
+    with jvplot.profile.Profiler() as prof:
+        with jvplot.Plot("fig.pdf", "10cm") as pl:
+            ...
+    print(prof.report())
+
+While no profiler is active, the drawing code is not instrumented at
+all, so that profiling has no cost when it is not used.  A
+:py:class:`Profiler` object records calls from all threads by default.
+The profiler used for ``profile=True`` only records calls from the
+thread which created the plot and from the thread which writes the
+output files, so that plots drawn concurrently in different threads
+get separate reports.
+
+The following phases are distinguished:
+
+* ``style``: resolution of graphics parameters
+* ``layout``: search for axis ranges, ticks and tick labels
+* ``text``: measuring text
+* ``transform``: conversion from data to device coordinates
+* ``path``: construction and emission of Cairo paths
+* ``paint``: stroking, filling, and rendering text and images
+* ``decorate``: drawing axis boxes, ticks and labels
+* ``finish``: writing the output file
+
+"""
+
+import collections
+import contextlib
+import functools
+import importlib
+import threading
+import time
+
+
+PHASES = ['style', 'layout', 'text', 'transform', 'path', 'paint',
+          'decorate', 'finish']
+
+# (module, class name or None, attribute name, phase)
+_TARGETS = [
+    ('jvplot.device', 'Device', '_get_param', 'style'),
+    ('jvplot.layout', 'Layout2D', 'fix', 'layout'),
+    ('jvplot.spatial', None, 'declutter', 'layout'),
+    ('cairocffi', 'Context', 'text_extents', 'text'),
+    ('cairocffi', 'Context', 'font_extents', 'text'),
+    ('jvplot.device', '_GlyphCache', 'run', 'text'),
+    ('jvplot.device', '_GlyphCache', 'font_extents', 'text'),
+    ('jvplot.axes', 'Axes', '_transform', 'transform'),
+    ('jvplot.path', None, 'encode', 'path'),
+    ('jvplot.path', None, 'append', 'path'),
+    ('jvplot.path', None, 'dots', 'path'),
+    ('jvplot.path', None, 'lines', 'path'),
+    ('jvplot.path', None, 'polygons', 'path'),
+    ('jvplot.path', None, 'rectangles', 'path'),
+    ('jvplot.raster', None, 'line_counts', 'path'),
+    ('jvplot.raster', None, 'point_counts', 'path'),
+    ('cairocffi', 'Context', 'stroke', 'paint'),
+    ('cairocffi', 'Context', 'stroke_preserve', 'paint'),
+    ('cairocffi', 'Context', 'fill', 'paint'),
+    ('cairocffi', 'Context', 'fill_preserve', 'paint'),
+    ('cairocffi', 'Context', 'paint', 'paint'),
+    ('cairocffi', 'Context', 'mask_surface', 'paint'),
+    ('jvplot.device', None, '_show_glyphs', 'paint'),
+    ('jvplot.axes', 'Axes', '_stamp_dots', 'paint'),
+    ('jvplot.axes', 'Axes', 'decorate', 'decorate'),
+    ('jvplot.axes', 'Axes', '_draw_ticks', 'decorate'),
+    ('jvplot.axes', 'Axes', '_draw_axis_label', 'decorate'),
+    ('jvplot.plot', 'Plot', '_finish', 'finish'),
+]
+
+_lock = threading.Lock()
+_active = []
+_saved = []
+_local = threading.local()
+
+
+PhaseStats = collections.namedtuple('PhaseStats', ['calls', 'total', 'own'])
+PhaseStats.__doc__ = """Timings for one phase of the drawing process.
+
+Attributes:
+    calls (int): how often the phase was entered.
+    total (float): the wall time spent in the phase, in seconds,
+        including time spent in other phases called from this one.
+    own (float): the wall time spent in the phase, in seconds,
+        excluding time spent in other phases called from this one.
+
+"""
+
+
+class Report:
+
+    """The result of profiling a plot.
+
+    Attributes:
+        wall_time (float): the total wall time in seconds between
+            starting and stopping the profiler.
+        phases (dict): a dictionary which maps phase names to
+            :py:class:`PhaseStats` objects.
+
+    """
+
+    def __init__(self, wall_time, phases):
+        self.wall_time = wall_time
+        self.phases = phases
+
+    def as_dict(self):
+        """Return the report as a dictionary of plain Python values."""
+        return {
+            'wall_time': self.wall_time,
+            'phases': {name: stats._asdict()
+                       for name, stats in self.phases.items()},
+        }
+
+    def __str__(self):
+        lines = ["%-10s %8s %10s %10s" % ("phase", "calls", "total", "own")]
+        for name, stats in self.phases.items():
+            lines.append("%-10s %8d %9.3fs %9.3fs" % (
+                name, stats.calls, stats.total, stats.own))
+        lines.append("%-10s %8s %9.3fs" % ("wall time", "", self.wall_time))
+        return "\n".join(lines)
+
+
+class Profiler:
+
+    """Record wall time and call counts for the phases of drawing.
+
+    A profiler can be used as a context manager, or can be started
+    and stopped explicitly using :py:meth:`start` and :py:meth:`stop`.
+
+    Args:
+        all_threads (bool, optional): If true (the default), calls
+            from all threads are recorded.  Otherwise, only calls
+            from the thread which called :py:meth:`start` are
+            recorded.
+
+    """
+
+    def __init__(self, *, all_threads=True):
+        self._lock = threading.Lock()
+        self._threads = None if all_threads else set()
+        self._calls = dict.fromkeys(PHASES, 0)
+        self._total = dict.fromkeys(PHASES, 0.0)
+        self._own = dict.fromkeys(PHASES, 0.0)
+        self._started = None
+        self._wall_time = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start recording."""
+        if self._started is not None:
+            return
+        if self._threads is not None:
+            self._threads.add(threading.get_ident())
+        self._started = time.perf_counter()
+        with _lock:
+            if not _active:
+                _instrument()
+            _active.append(self)
+
+    def stop(self):
+        """Stop recording."""
+        if self._started is None:
+            return
+        with _lock:
+            _active.remove(self)
+            if not _active:
+                _restore()
+        self._wall_time += time.perf_counter() - self._started
+        self._started = None
+
+    def report(self):
+        """Return the timings recorded so far, as a :py:class:`Report`."""
+        wall_time = self._wall_time
+        if self._started is not None:
+            wall_time += time.perf_counter() - self._started
+        phases = collections.OrderedDict()
+        with self._lock:
+            for name in PHASES:
+                phases[name] = PhaseStats(self._calls[name],
+                                          self._total[name], self._own[name])
+        return Report(wall_time, phases)
+
+    @contextlib.contextmanager
+    def _thread(self):
+        """Also record calls from the current thread, while the context
+        is active.  This has no effect for profilers which record all
+        threads.
+
+        """
+        if self._threads is None:
+            yield
+            return
+        ident = threading.get_ident()
+        if ident in self._threads:
+            yield
+            return
+        self._threads.add(ident)
+        try:
+            yield
+        finally:
+            self._threads.discard(ident)
+
+    def _record(self, phase, total, own, outermost):
+        threads = self._threads
+        if threads is not None and threading.get_ident() not in threads:
+            return
+        with self._lock:
+            if outermost:
+                self._calls[phase] += 1
+                self._total[phase] += total
+            self._own[phase] += own
+
+
+def _timed(fn, phase):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        outermost = all(frame[0] != phase for frame in stack)
+        frame = [phase, 0.0]
+        stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            stack.pop()
+            if stack:
+                stack[-1][1] += dt
+            for prof in list(_active):
+                prof._record(phase, dt, dt - frame[1], outermost)
+    return wrapper
+
+
+def _instrument():
+    for mod_name, cls_name, attr, phase in _TARGETS:
+        owner = importlib.import_module(mod_name)
+        if cls_name is not None:
+            owner = getattr(owner, cls_name)
+        orig = owner.__dict__[attr]
+        _saved.append((owner, attr, orig))
+        setattr(owner, attr, _timed(orig, phase))
+
+
+def _restore():
+    while _saved:
+        owner, attr, orig = _saved.pop()
+        setattr(owner, attr, orig)
@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+
+import concurrent.futures
+
+import pytest
+
+import numpy as np
+
+from . import axes, plot, profile
+
+def test_plot_profile():
+    with plot.Plot("/dev/null", "5in", "3in", profile=True) as pl:
+        x = np.linspace(0, 10, 100)
+        pl.plot(x, np.sin(x))
+    report = pl.profile
+    assert set(report.phases) == set(profile.PHASES)
+    for name in ['style', 'layout', 'transform', 'path', 'paint',
+                 'decorate', 'finish']:
+        assert report.phases[name].calls > 0, name
+    for stats in report.phases.values():
+        assert 0 <= stats.own <= stats.total + 1e-9
+    assert report.phases['finish'].calls == 1
+    assert "decorate" in str(report)
+
+    # instrumentation is removed once profiling stops
+    assert not hasattr(axes.Axes._transform, '__wrapped__')
+
+def test_profiler_nested():
+    with profile.Profiler() as outer:
+        with profile.Profiler() as inner:
+            with plot.Plot("/dev/null", "3in", "3in") as pl:
+                pl.plot([1, 2, 3])
+        with plot.Plot("/dev/null", "3in", "3in") as pl:
+            pl.plot([1, 2, 3])
+    assert outer.report().phases['finish'].calls == 2
+    assert inner.report().phases['finish'].calls == 1
+
+def test_profile_background():
+    pl = plot.Plot("/dev/null", "3in", "3in", profile=True, executor=True)
+    pl.plot([1, 2, 3])
+    pl.close().result()
+    assert pl.profile.phases['finish'].calls == 1
+    assert not hasattr(axes.Axes._transform, '__wrapped__')
+
+def test_profile_threads():
+    def work(n):
+        with plot.Plot("/dev/null", "3in", "3in", profile=True) as pl:
+            for _ in range(n):
+                pl.plot([1, 2, 3])
+        return pl.profile
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        reports = list(pool.map(work, [1, 5]))
+    small, large = [r.phases['decorate'].calls for r in reports]
+    assert 5 * small == large
+
+def test_profile_invalid_plot():
+    with pytest.raises(ValueError):
+        plot.Plot("fig.xyz", "3in", "3in", profile=True)
+    assert not hasattr(axes.Axes._transform, '__wrapped__')
+
+def test_profile_text():
+    with plot.Plot("/dev/null", "3in", "3in") as pl:
+        ax = pl.axes(x_lim=(0, 1), y_lim=(0, 1))
+        with profile.Profiler() as prof:
+            ax.draw_text("hello", .5, .5)
+    assert prof.report().phases['paint'].calls >= 1
@@ -0,0 +1,193 @@
+# raster.py - accumulate plot elements into pixel grids
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Rasterization
+-------------
+
+The functions in this module count how many plot elements cover
+each pixel of a grid, using NumPy instead of Cairo.  The results are
+used to show the density of very large numbers of overlapping lines
+or points as an image.
+
+All coordinates are given in pixel units, where pixel ``(i, j)`` of
+the result covers the square ``[j, j+1] x [i, i+1]``.
+
+"""
+
+import numpy as np
+
+
+def clip_segments(x0, y0, x1, y1, width, height):
+    """Clip line segments to the rectangle ``[0, width] x [0, height]``.
+
+    Returns:
+        The clipped end points `x0`, `y0`, `x1`, `y1`, together with
+        a boolean array which indicates which segments intersect the
+        rectangle.  For the other segments, the returned coordinates
+        are meaningless.
+
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    t0 = np.zeros(len(x0))
+    t1 = np.ones(len(x0))
+    keep = np.isfinite(dx) & np.isfinite(dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x0), (dx, width - x0), (-dy, y0), (dy, height - y0)):
+            r = q / p
+            neg = p < 0
+            pos = p > 0
+            t0 = np.where(neg, np.maximum(t0, r), t0)
+            t1 = np.where(pos, np.minimum(t1, r), t1)
+            keep &= ~((p == 0) & (q < 0))
+    keep &= t0 <= t1
+    return (x0 + t0*dx, y0 + t0*dy, x0 + t1*dx, y0 + t1*dy), keep
+
+
+def line_counts(x, y, offsets, width, height):
+    """Count how many lines pass through each pixel.
+
+    Every segment is sampled at steps of at most one pixel.  A line
+    which passes through a pixel several times in a row is counted
+    once.  Segments where one of the end points is ``nan`` are ignored.
+
+    Args:
+        x (array): The horizontal vertex coordinates, in pixel units.
+        y (array): The vertical vertex coordinates, in pixel units.
+        offsets (integer array): Line `k` consists of the vertices
+            ``offsets[k]``, ..., ``offsets[k+1]-1``.
+        width (int): The number of pixel columns.
+        height (int): The number of pixel rows.
+
+    Returns:
+        An integer array of shape ``(height, width)``.
+
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    n = len(x)
+    if n < 2:
+        return np.zeros((height, width), dtype=np.intp)
+
+    # segment i connects vertices i and i+1, within the same line
+    last = np.zeros(n, dtype=bool)
+    last[offsets[1:] - 1] = True
+    seg = np.flatnonzero(~last[:-1])
+    line = np.searchsorted(offsets, seg, side='right') - 1
+
+    (x0, y0, x1, y1), keep = clip_segments(x[seg], y[seg], x[seg+1], y[seg+1],
+                                           width, height)
+    x0, y0, x1, y1, line = x0[keep], y0[keep], x1[keep], y1[keep], line[keep]
+    dx = x1 - x0
+    dy = y1 - y0
+
+    # sample every segment at the midpoints of k equal steps
+    k = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.intp)
+    np.maximum(k, 1, out=k)
+    sid = np.repeat(np.arange(len(k)), k)
+    start = np.cumsum(k) - k
+    t = (np.arange(len(sid)) - start[sid] + .5) / k[sid]
+    ix = np.clip((x0[sid] + t*dx[sid]).astype(np.intp), 0, width - 1)
+    iy = np.clip((y0[sid] + t*dy[sid]).astype(np.intp), 0, height - 1)
+    pix = iy * width + ix
+
+    line = line[sid]
+    new = np.ones(len(pix), dtype=bool)
+    new[1:] = (pix[1:] != pix[:-1]) | (line[1:] != line[:-1])
+    counts = np.bincount(pix[new], minlength=width*height)
+    return counts.reshape((height, width))
+
+
+def point_counts(x, y, radius, width, height):
+    """Count how many round points cover each pixel.
+
+    A pixel is covered by a point if the centre of the pixel is at
+    most `radius` away from the centre of the pixel which contains
+    the point.  Points where one of the coordinates is ``nan`` are
+    ignored.
+
+    Args:
+        x (array): The horizontal point coordinates, in pixel units.
+        y (array): The vertical point coordinates, in pixel units.
+        radius (number): The radius of the points, in pixel units.
+        width (int): The number of pixel columns.
+        height (int): The number of pixel rows.
+
+    Returns:
+        An integer array of shape ``(height, width)``.
+
+    """
+    r = int(np.floor(max(radius, 0)))
+
+    # Count the points per pixel, on a grid extended by r pixels on
+    # all sides, so that points just outside the grid are included.
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    with np.errstate(invalid='ignore'):
+        ix = np.floor(x) + r
+        iy = np.floor(y) + r
+        keep = (ix >= 0) & (ix < width + 2*r) & (iy >= 0) & (iy < height + 2*r)
+    w2 = width + 2*r
+    pix = iy[keep].astype(np.intp) * w2 + ix[keep].astype(np.intp)
+    base = np.bincount(pix, minlength=w2 * (height + 2*r))
+    base = base.reshape((height + 2*r, w2))
+
+    # Spread the counts over a disk, one row of the disk at a time,
+    # using prefix sums along the rows.
+    cum = np.zeros((height + 2*r, w2 + 1), dtype=base.dtype)
+    np.cumsum(base, axis=1, out=cum[:, 1:])
+    cols = np.arange(width) + r
+    counts = np.zeros((height, width), dtype=base.dtype)
+    for dy in range(-r, r + 1):
+        hw = int(np.floor(np.sqrt(radius*radius - dy*dy)))
+        rows = cum[r+dy:r+dy+height]
+        counts += rows[:, cols + hw + 1] - rows[:, cols - hw]
+    return counts
+
+
+def dedup(x, y, step):
+    """Select one point from every cell of a grid.
+
+    The coordinates are rounded to multiples of `step`, and of all
+    points which are rounded to the same position only the first one
+    is kept.  Points where one of the coordinates is ``nan`` are
+    dropped.
+
+    Args:
+        x (array): The horizontal point coordinates.
+        y (array): The vertical point coordinates.
+        step (number): The grid spacing.
+
+    Returns:
+        The indices of the points to keep, in increasing order.
+
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    idx = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(idx) == 0:
+        return idx
+    qx = np.rint(x[idx] / step)
+    qy = np.rint(y[idx] / step)
+    qx -= np.min(qx)
+    qy -= np.min(qy)
+    nx = np.max(qx) + 1
+    if nx * (np.max(qy) + 1) < 2.0**62:
+        # pack both grid coordinates into a single integer key
+        key = qy.astype(np.int64) * np.int64(nx) + qx.astype(np.int64)
+        _, first = np.unique(key, return_index=True)
+    else:
+        _, first = np.unique(np.column_stack([qx, qy]), axis=0,
+                             return_index=True)
+    return idx[np.sort(first)]
@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+
+import numpy as np
+
+from . import raster
+
+
+def test_clip_segments():
+    x0 = np.array([-1., 1., 5., 1.])
+    y0 = np.array([1., 1., 5., 0.])
+    x1 = np.array([3., 2., 6., 1.])
+    y1 = np.array([1., 1., 6., 2.])
+    (a, b, c, d), keep = raster.clip_segments(x0, y0, x1, y1, 2, 2)
+    assert list(keep) == [True, True, False, True]
+    assert (a[0], b[0], c[0], d[0]) == (0, 1, 2, 1)
+    assert (a[1], b[1], c[1], d[1]) == (1, 1, 2, 1)
+    assert (a[3], b[3], c[3], d[3]) == (1, 0, 1, 2)
+
+def test_line_counts():
+    # one horizontal line through the middle of row 1
+    counts = raster.line_counts([0, 4], [1.5, 1.5], [0, 2], 4, 3)
+    assert counts.shape == (3, 4)
+    assert np.array_equal(counts[1], [1, 1, 1, 1])
+    assert np.sum(counts) == 4
+
+    # a line which stays in one pixel is counted once, two lines twice
+    counts = raster.line_counts([.1, .2, .3, .1, .9], [.1, .5, .2, .9, .1],
+                                [0, 3, 5], 2, 2)
+    assert counts[0, 0] == 2
+    assert np.sum(counts) == 2
+
+    # segments outside the grid and between lines are ignored
+    counts = raster.line_counts([-5, -1, 10, 11], [0, 0, 0, 0],
+                                [0, 2, 4], 4, 4)
+    assert np.sum(counts) == 0
+
+    # nan vertices break lines
+    counts = raster.line_counts([0, 1, np.nan, 2, 3], [.5, .5, .5, .5, .5],
+                                [0, 5], 4, 1)
+    assert np.array_equal(counts[0], [1, 0, 1, 0])
+
+def test_point_counts():
+    counts = raster.point_counts([2.5, 2.5, np.nan], [2.5, 2.7, 1], 1.5, 6, 5)
+    expected = np.zeros((5, 6), dtype=int)
+    expected[1:4, 1:4] = 2
+    assert np.array_equal(counts, expected)
+
+    # points outside the grid still cover pixels within their radius
+    counts = raster.point_counts([-.5], [.2], 1, 3, 3)
+    assert counts[0, 0] == 1 and np.sum(counts) == 1
+
+    rng = np.random.default_rng(1)
+    x = rng.uniform(-5, 45, size=500)
+    y = rng.uniform(-5, 35, size=500)
+    counts = raster.point_counts(x, y, 3.2, 40, 30)
+    jj, ii = np.meshgrid(np.arange(40), np.arange(30))
+    for k in range(0, 500, 50):
+        d2 = (jj - np.floor(x[k]))**2 + (ii - np.floor(y[k]))**2
+        single = raster.point_counts(x[k:k+1], y[k:k+1], 3.2, 40, 30)
+        assert np.array_equal(single, d2 <= 3.2**2)
+
+def test_dedup():
+    x = [0, .1, 1, np.nan, 1.05, 3, 0]
+    y = [0, .1, 0, 0, -.05, 0, 1]
+    assert list(raster.dedup(x, y, .5)) == [0, 2, 5, 6]
+    assert list(raster.dedup(x, y, .01)) == [0, 1, 2, 4, 5, 6]
+    assert list(raster.dedup([1e300, -1e300], [0, 0], 1)) == [0, 1]
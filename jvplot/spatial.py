@@ -0,0 +1,351 @@
+# spatial.py - uniform grid indices for plot elements
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Spatial Indices
+---------------
+
+The classes in this module divide the plane into a uniform grid of
+rectangular cells, so that the objects close to a given position can
+be found by only looking at a few cells.  If the cell size is chosen
+to be similar to the size of the objects, every query only has to
+examine a bounded number of objects.
+
+"""
+
+import math
+
+import numpy as np
+import scipy.ndimage
+
+
+class BoxGrid:
+
+    """A collection of axis-parallel rectangles, organised for fast
+    overlap tests.
+
+    Args:
+        cell_width (number): The width of the grid cells.
+        cell_height (number): The height of the grid cells.
+
+    """
+
+    def __init__(self, cell_width, cell_height):
+        if not (cell_width > 0 and cell_height > 0):
+            raise ValueError("cell size must be positive")
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.boxes = []
+        self._cells = {}
+
+    def _cell_range(self, x0, y0, x1, y1):
+        i0 = math.floor(x0 / self.cell_width)
+        i1 = math.floor(x1 / self.cell_width)
+        j0 = math.floor(y0 / self.cell_height)
+        j1 = math.floor(y1 / self.cell_height)
+        return range(i0, i1 + 1), range(j0, j1 + 1)
+
+    def overlaps(self, x0, y0, x1, y1):
+        """Check whether a rectangle overlaps any of the rectangles
+        in the grid.
+
+        Rectangles which only touch along their boundary do not count
+        as overlapping.
+
+        """
+        cols, rows = self._cell_range(x0, y0, x1, y1)
+        boxes = self.boxes
+        for i in cols:
+            for j in rows:
+                for k in self._cells.get((i, j), ()):
+                    b = boxes[k]
+                    if x0 < b[2] and b[0] < x1 and y0 < b[3] and b[1] < y1:
+                        return True
+        return False
+
+    def add(self, x0, y0, x1, y1):
+        """Add a rectangle to the grid.
+
+        Returns:
+            The index of the new rectangle in :py:attr:`boxes`.
+
+        """
+        k = len(self.boxes)
+        self.boxes.append((x0, y0, x1, y1))
+        cols, rows = self._cell_range(x0, y0, x1, y1)
+        for i in cols:
+            for j in rows:
+                self._cells.setdefault((i, j), []).append(k)
+        return k
+
+
+def declutter(x0, y0, x1, y1, priority=None):
+    """Select a set of non-overlapping rectangles.
+
+    The rectangles are considered in order of decreasing priority,
+    and every rectangle which does not overlap any of the rectangles
+    selected so far is selected.  Rectangles with non-finite
+    coordinates are never selected.
+
+    Args:
+        x0 (array): The left edges of the rectangles.
+        y0 (array): The bottom edges of the rectangles.
+        x1 (array): The right edges of the rectangles.
+        y1 (array): The top edges of the rectangles.
+        priority (array, optional): The priorities of the rectangles.
+            If this is not given, or for rectangles of equal priority,
+            rectangles which come earlier in the list take precedence.
+
+    Returns:
+        A boolean array which indicates the selected rectangles.
+
+    """
+    x0 = np.asarray(x0, dtype=np.float64).reshape(-1)
+    y0 = np.asarray(y0, dtype=np.float64).reshape(-1)
+    x1 = np.asarray(x1, dtype=np.float64).reshape(-1)
+    y1 = np.asarray(y1, dtype=np.float64).reshape(-1)
+    n = len(x0)
+    keep = np.zeros(n, dtype=bool)
+    valid = (np.isfinite(x0) & np.isfinite(y0)
+             & np.isfinite(x1) & np.isfinite(y1))
+    if not np.any(valid):
+        return keep
+
+    if priority is None:
+        order = np.arange(n)
+    else:
+        priority = np.broadcast_to(np.asarray(priority, dtype=np.float64), (n,))
+        order = np.argsort(-priority, kind='stable')
+    order = order[valid[order]]
+
+    # Use cells of the size of a typical rectangle, so that every
+    # rectangle meets only a few cells.
+    w = np.median(x1[valid] - x0[valid])
+    h = np.median(y1[valid] - y0[valid])
+    grid = BoxGrid(w if w > 0 else 1, h if h > 0 else 1)
+    boxes = np.column_stack([x0, y0, x1, y1]).tolist()
+    for k in order.tolist():
+        box = boxes[k]
+        if not grid.overlaps(*box):
+            grid.add(*box)
+            keep[k] = True
+    return keep
+
+
+class PointGrid:
+
+    """A collection of points, organised for fast proximity queries.
+
+    The points are sorted by grid cell, and the cells are stored in
+    compressed form: the points of cell ``c`` are the entries
+    ``starts[c]``, ..., ``starts[c+1]-1`` of the sorted arrays.
+
+    Args:
+        x (array): The horizontal coordinates of the points.
+        y (array): The vertical coordinates of the points.
+        cell_size (number, optional): The width and height of the grid
+            cells.  If this is not given, the cell size is chosen so
+            that a cell contains about `points_per_cell` points on
+            average.
+        points_per_cell (number, optional): See `cell_size`.
+
+    Points where one of the coordinates is ``nan`` are not included
+    in the index.
+
+    """
+
+    def __init__(self, x, y, *, cell_size=None, points_per_cell=4):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        if len(x) != len(y):
+            tmpl = 'x and y have incompatible lengths: %d != %d'
+            raise ValueError(tmpl % (len(x), len(y)))
+        idx = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        n = len(idx)
+
+        if n > 0:
+            self.x_min = np.min(x[idx])
+            self.y_min = np.min(y[idx])
+            w = np.max(x[idx]) - self.x_min
+            h = np.max(y[idx]) - self.y_min
+        else:
+            self.x_min = self.y_min = 0.0
+            w = h = 0.0
+        if cell_size is None:
+            k = points_per_cell / max(n, 1)
+            cell_size = max(np.sqrt(w * h * k), max(w, h) * k)
+            if not cell_size > 0:
+                cell_size = 1.0
+        self.cell_size = float(cell_size)
+        self.nx = int(w // self.cell_size) + 1
+        self.ny = int(h // self.cell_size) + 1
+
+        ci, cj = self._cell(x[idx], y[idx])
+        cid = cj * self.nx + ci
+        order = np.argsort(cid, kind='stable')
+        self.index = idx[order]
+        self.xs = x[self.index]
+        self.ys = y[self.index]
+        self.starts = np.zeros(self.nx * self.ny + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cid, minlength=self.nx * self.ny),
+                  out=self.starts[1:])
+
+        # for every cell, the nearest cell which contains points
+        empty = (np.diff(self.starts) == 0).reshape((self.ny, self.nx))
+        if n > 0 and np.any(empty):
+            jj, ii = scipy.ndimage.distance_transform_edt(
+                empty, return_distances=False, return_indices=True)
+            self._nonempty = (jj * self.nx + ii).reshape(-1)
+        else:
+            self._nonempty = np.arange(self.nx * self.ny)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _cell(self, x, y):
+        ci = np.floor((x - self.x_min) / self.cell_size)
+        cj = np.floor((y - self.y_min) / self.cell_size)
+        ci = np.clip(ci, 0, self.nx - 1).astype(np.intp)
+        cj = np.clip(cj, 0, self.ny - 1).astype(np.intp)
+        return ci, cj
+
+    def nearest(self, x, y, max_dist=np.inf):
+        """Find the nearest point for each of a list of query positions.
+
+        Args:
+            x (array): The horizontal coordinates of the query positions.
+            y (array): The vertical coordinates of the query positions.
+            max_dist (number, optional): Points further away than this
+                are not returned.
+
+        Returns:
+            A tuple ``(idx, dist)`` of arrays with the same shape as
+            the query positions.  ``idx`` gives the indices of the
+            nearest points in the arrays used to construct the index,
+            or -1 if there is no point within distance `max_dist`.
+            ``dist`` gives the corresponding distances, or ``inf``.
+
+        """
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64),
+                                   np.asarray(y, dtype=np.float64))
+        shape = x.shape
+        x = x.reshape(-1)
+        y = y.reshape(-1)
+        best = np.full(len(x), np.inf)
+        best_pos = np.full(len(x), -1, dtype=np.intp)
+        q = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        if len(self) == 0 or len(q) == 0:
+            return best_pos.reshape(shape), best.reshape(shape)
+        a = self.cell_size
+
+        # The points in the non-empty cell closest to the query cell
+        # give an upper bound for the distance.
+        ci, cj = self._cell(x[q], y[q])
+        c = self._nonempty[cj * self.nx + ci]
+        s = self.starts[c]
+        e = self.starts[c + 1]
+        qq = np.repeat(q, e - s)
+        pos = _ranges(s, e)
+        d2 = np.square(self.xs[pos] - x[qq]) + np.square(self.ys[pos] - y[qq])
+        g, bound, _ = _group_min(qq, d2)
+        bound = np.minimum(bound, max_dist * max_dist)
+        r = np.sqrt(bound)
+
+        # Now examine all cells which meet the disk of radius r around
+        # the query position.  The cells of each grid row are
+        # consecutive in the sorted arrays.
+        j0 = np.floor((y[g] - r - self.y_min) / a)
+        j1 = np.floor((y[g] + r - self.y_min) / a)
+        j0 = np.clip(j0, 0, self.ny).astype(np.intp)
+        j1 = np.clip(j1, -1, self.ny - 1).astype(np.intp)
+        n_rows = np.maximum(j1 - j0 + 1, 0)
+        k = np.repeat(np.arange(len(g)), n_rows)
+        j = np.repeat(j0, n_rows) + _ranges(np.zeros(len(g), dtype=np.intp),
+                                            n_rows)
+        row_y = self.y_min + j * a
+        dy = np.maximum.reduce([np.zeros(len(j)), row_y - y[g[k]],
+                                y[g[k]] - row_y - a])
+        hw = np.sqrt(np.maximum(bound[k] - np.square(dy), 0))
+        i0 = np.floor((x[g[k]] - hw - self.x_min) / a)
+        i1 = np.floor((x[g[k]] + hw - self.x_min) / a)
+        i0 = np.clip(i0, 0, self.nx - 1).astype(np.intp)
+        i1 = np.clip(i1, 0, self.nx - 1).astype(np.intp)
+        s = self.starts[j * self.nx + i0]
+        e = self.starts[j * self.nx + i1 + 1]
+        qq = np.repeat(g[k], e - s)
+        pos = _ranges(s, e)
+        d2 = np.square(self.xs[pos] - x[qq]) + np.square(self.ys[pos] - y[qq])
+        g, mins, first = _group_min(qq, d2)
+        found = mins <= bound[np.searchsorted(q, g)]
+        best[g[found]] = mins[found]
+        best_pos[g[found]] = pos[first[found]]
+
+        best = np.sqrt(best)
+        idx = np.where(best_pos >= 0, self.index[np.maximum(best_pos, 0)], -1)
+        return idx.reshape(shape), best.reshape(shape)
+
+    def in_rect(self, x0, y0, x1, y1):
+        """Find all points inside a rectangle.
+
+        Args:
+            x0 (number): The left edge of the rectangle.
+            y0 (number): The bottom edge of the rectangle.
+            x1 (number): The right edge of the rectangle.
+            y1 (number): The top edge of the rectangle.
+
+        Returns:
+            The indices of the points in the closed rectangle, in
+            increasing order.
+
+        """
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.intp)
+        (i0, i1), (j0, j1) = self._cell(np.array([x0, x1]),
+                                        np.array([y0, y1]))
+
+        # the cells i0, ..., i1 of a row are stored consecutively
+        rows = np.arange(j0, j1 + 1) * self.nx
+        s = self.starts[rows + i0]
+        e = self.starts[rows + i1 + 1]
+        pos = _ranges(s, e)
+        xs = self.xs[pos]
+        ys = self.ys[pos]
+        inside = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+        return np.sort(self.index[pos[inside]])
+
+
+def _ranges(s, e):
+    """Concatenate the ranges ``s[k], ..., e[k]-1``."""
+    n = e - s
+    total = int(np.sum(n))
+    if total == 0:
+        return np.zeros(0, dtype=np.intp)
+    shift = np.repeat(s - (np.cumsum(n) - n), n)
+    return np.arange(total, dtype=np.intp) + shift
+
+def _group_min(q, d):
+    """Find the minimum of `d` within each group of equal, consecutive
+    entries of `q`.
+
+    Returns the group labels, the minima, and the position of the
+    first minimum of each group.
+
+    """
+    if len(q) == 0:
+        return q, d, np.zeros(0, dtype=np.intp)
+    first = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+    mins = np.minimum.reduceat(d, first)
+    sizes = np.diff(np.r_[first, len(q)])
+    k = np.where(d == np.repeat(mins, sizes), np.arange(len(d)), len(d))
+    return q[first], mins, np.minimum.reduceat(k, first)
@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+import numpy as np
+
+from . import spatial
+
+
+def test_box_grid():
+    grid = spatial.BoxGrid(1, 1)
+    grid.add(0, 0, 2, 1)
+    assert grid.overlaps(1.5, .5, 3, 3)
+    assert not grid.overlaps(2, 0, 3, 1)  # touching is allowed
+    assert not grid.overlaps(-5, -5, -4, -4)
+    assert grid.overlaps(-10, -10, 10, 10)
+
+def test_declutter():
+    x0 = np.array([0, 1, 2.5, 0, np.nan])
+    y0 = np.array([0, 0, 0, 5, 0])
+    keep = spatial.declutter(x0, y0, x0 + 2, y0 + 1)
+    assert list(keep) == [True, False, True, True, False]
+    keep = spatial.declutter(x0, y0, x0 + 2, y0 + 1,
+                             priority=[0, 1, 0, 0, 0])
+    assert list(keep) == [False, True, False, True, False]
+
+    rng = np.random.default_rng(1)
+    x0 = rng.uniform(0, 100, size=2000)
+    y0 = rng.uniform(0, 100, size=2000)
+    w = rng.uniform(1, 5, size=2000)
+    keep = spatial.declutter(x0, y0, x0 + w, y0 + 2)
+    k = np.flatnonzero(keep)
+    a, b = np.meshgrid(k, k)
+    overlap = ((x0[a] < x0[b] + w[b]) & (x0[b] < x0[a] + w[a])
+               & (y0[a] < y0[b] + 2) & (y0[b] < y0[a] + 2))
+    assert np.sum(overlap) == len(k)
+    # every omitted box overlaps a selected one which comes earlier
+    for i in np.flatnonzero(~keep)[:50]:
+        j = k[k < i]
+        assert np.any((x0[j] < x0[i] + w[i]) & (x0[i] < x0[j] + w[j])
+                      & (y0[j] < y0[i] + 2) & (y0[i] < y0[j] + 2))
+
+def test_point_grid():
+    rng = np.random.default_rng(2)
+    x = rng.standard_normal(5000)
+    y = rng.standard_normal(5000)
+    x[10] = np.nan
+    grid = spatial.PointGrid(x, y)
+    assert len(grid) == 4999
+
+    qx = np.r_[rng.uniform(-4, 4, size=100), 50, -30, np.nan]
+    qy = np.r_[rng.uniform(-4, 4, size=100), 50, 0, 0]
+    idx, dist = grid.nearest(qx, qy)
+    d = np.hypot(x - qx[:, None], y - qy[:, None])
+    d[:, 10] = np.inf
+    assert np.array_equal(idx[:-1], np.argmin(d[:-1], axis=1))
+    assert np.allclose(dist[:-1], np.min(d[:-1], axis=1))
+    assert idx[-1] == -1 and dist[-1] == np.inf
+
+    idx, dist = grid.nearest(qx, qy, max_dist=.1)
+    assert np.array_equal(idx >= 0, np.min(d, axis=1) <= .1)
+
+    idx, _ = grid.nearest([[0, 1], [2, 3]], 0)
+    assert idx.shape == (2, 2)
+
+    k = grid.in_rect(1, -1, -.5, .5)
+    expected = np.flatnonzero((x >= -.5) & (x <= 1) & (y >= -1) & (y <= .5))
+    assert np.array_equal(k, expected)
+
+    empty = spatial.PointGrid([], [])
+    assert empty.nearest(0, 0)[0] == -1
+    assert len(empty.in_rect(0, 0, 1, 1)) == 0
@@ -0,0 +1,300 @@
+# spec.py - serializable descriptions of figures
+# Copyright (C) 2014-2018 Jochen Voss <voss@seehuhn.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+"""Figure Specifications
+---------------------
+
+A :py:class:`Figure` object records the plotting commands for a figure
+without drawing anything.  The recorded figure does not hold any Cairo
+objects and can be pickled, for example to send it to a different
+process, where it is rendered using :py:func:`render`::
+
+    fig = jvplot.spec.Figure("10cm", "7cm")
+    ax = fig.axes(x_range=(0, 1), y_range=(0, 1))
+    ax.draw_points(x, y)
+
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        pool.submit(jvplot.spec.render, fig, "fig.png").result()
+
+The methods of :py:class:`jvplot.canvas.Canvas` and
+:py:class:`jvplot.axes.Axes` can be called on a :py:class:`Figure`
+and on the objects returned by these calls.  Return values are
+placeholders, which can only be used to record further commands or
+as arguments of later commands; they can also be indexed, for
+example to access the axes returned by
+:py:meth:`jvplot.canvas.Canvas.grid_plot`.  Functions passed as
+arguments must be picklable, *i.e.* defined at the top level of a
+module.
+
+To avoid copying large data arrays between processes,
+:py:meth:`Figure.share` moves all NumPy arrays used in a figure into
+a block of shared memory.  The worker processes then access the data
+in place.
+
+"""
+
+import gc
+import pickle
+
+import numpy as np
+
+from multiprocessing import resource_tracker, shared_memory
+
+from . import plot
+
+
+class _Ref:
+
+    """A placeholder for the result of a recorded command."""
+
+    def __init__(self, handle):
+        self.handle = handle
+
+
+class _SharedArray:
+
+    """A reference to a NumPy array stored in shared memory."""
+
+    def __init__(self, offset, shape, dtype):
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+
+
+class _Handle:
+
+    def __init__(self, fig, handle):
+        self._fig = fig
+        self._handle = handle
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._fig._recorder(self._handle, name)
+
+    def __getitem__(self, key):
+        return self._fig._record(self._handle, '__getitem__', (key,), {})
+
+    def __reduce__(self):
+        return (_Ref, (self._handle,))
+
+
+class Figure(_Handle):
+
+    """A serializable description of a figure.
+
+    The arguments are the same as for :py:class:`jvplot.plot.Plot`,
+    except that the output file name is only given when the figure is
+    rendered.
+
+    Args:
+        width: The figure width.
+        height (optional): The figure height.
+        res (number, optional): The device resolution in pixels per inch.
+        style (dict, optional): Default plot graphics values for the
+            figure.
+
+    """
+
+    def __init__(self, width, height=None, *, res=None, style=None):
+        super().__init__(self, 0)
+        self.width = width
+        self.height = height
+        self.res = res
+        self.style = style or {}
+        self.ops = []
+        self._n_handles = 1
+        self._shm = None
+        self._shm_name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_fig']
+        state['_shm'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._fig = self
+
+    def __reduce__(self):
+        return object.__reduce__(self)
+
+    def _recorder(self, target, name):
+        def record(*args, **kwargs):
+            return self._record(target, name, args, kwargs)
+        record.__name__ = name
+        return record
+
+    def _record(self, target, name, args, kwargs):
+        if self._shm_name is not None:
+            raise ValueError("cannot add commands to a shared figure")
+        handle = self._n_handles
+        self._n_handles += 1
+        args = _map_args(args, _to_ref)
+        kwargs = _map_args(kwargs, _to_ref)
+        self.ops.append((target, name, args, kwargs, handle))
+        return _Handle(self, handle)
+
+    def share(self):
+        """Move the data arrays of the figure into shared memory.
+
+        Returns:
+            A new :py:class:`Figure`, which refers to the data in shared
+            memory.  The shared memory is released when the returned
+            figure is closed, either explicitly using :py:meth:`close`
+            or by using the figure as a context manager.  The figure
+            must not be closed before all worker processes have
+            finished rendering it.
+
+        """
+        arrays = []
+        size = 0
+
+        def collect(obj):
+            nonlocal size
+            if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+                size = _align(size)
+                arrays.append((size, obj))
+                ref = _SharedArray(size, obj.shape, obj.dtype.str)
+                size += obj.nbytes
+                return ref
+            return obj
+        ops = _map_args(self.ops, collect)
+
+        shared = Figure(self.width, self.height, res=self.res,
+                        style=self.style)
+        shared.ops = ops
+        shared._n_handles = self._n_handles
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for offset, a in arrays:
+            dst = np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf,
+                             offset=offset)
+            dst[...] = a
+            del dst
+        shared._shm = shm
+        shared._shm_name = shm.name
+        return shared
+
+    def close(self):
+        """Release the shared memory used by the figure, if any."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def dumps(self):
+        """Return the figure as a byte string.
+
+        The figure can be restored using :py:func:`pickle.loads`.
+
+        """
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def render(self, file_name):
+        """Draw the figure.
+
+        Args:
+            file_name (string or list of strings): The output file
+                name(s), as for :py:class:`jvplot.plot.Plot`.
+
+        """
+        render(self, file_name)
+
+
+def render(fig, file_name):
+    """Draw a figure which has been recorded using :py:class:`Figure`.
+
+    This function can be used as the target of a process pool.
+
+    Args:
+        fig (Figure or bytes): The figure to draw, either as a
+            :py:class:`Figure` object or in the form returned by
+            :py:meth:`Figure.dumps`.
+        file_name (string or list of strings): The output file
+            name(s), as for :py:class:`jvplot.plot.Plot`.
+
+    """
+    if isinstance(fig, bytes):
+        fig = pickle.loads(fig)
+
+    shm = None
+    if fig._shm_name is not None:
+        shm = _attach(fig._shm_name)
+    try:
+        _replay(fig, file_name, shm)
+    finally:
+        if shm is not None:
+            # Objects created while drawing may still refer to the
+            # shared arrays via reference cycles.
+            gc.collect()
+            shm.close()
+
+def _replay(fig, file_name, shm):
+    def resolve(obj):
+        if isinstance(obj, _Ref):
+            return objs[obj.handle]
+        if isinstance(obj, _SharedArray):
+            a = np.ndarray(obj.shape, dtype=obj.dtype, buffer=shm.buf,
+                           offset=obj.offset)
+            a.flags.writeable = False
+            return a
+        return obj
+
+    with plot.Plot(file_name, fig.width, fig.height, res=fig.res,
+                   style=fig.style) as pl:
+        objs = {0: pl}
+        for target, name, args, kwargs, handle in fig.ops:
+            obj = objs[target]
+            args = _map_args(args, resolve)
+            kwargs = _map_args(kwargs, resolve)
+            if name == '__getitem__':
+                objs[handle] = obj[args[0]]
+            else:
+                objs[handle] = getattr(obj, name)(*args, **kwargs)
+            del args, kwargs
+        objs.clear()
+
+def _attach(name):
+    try:
+        # avoid the resource tracker of the worker process removing
+        # the shared memory block when the worker exits
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def _to_ref(obj):
+    if isinstance(obj, _Handle):
+        return _Ref(obj._handle)
+    return obj
+
+def _map_args(obj, fn):
+    if isinstance(obj, tuple):
+        return tuple(_map_args(x, fn) for x in obj)
+    if isinstance(obj, list):
+        return [_map_args(x, fn) for x in obj]
+    if isinstance(obj, dict):
+        return {key: _map_args(val, fn) for key, val in obj.items()}
+    return fn(obj)
+
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
@@ -0,0 +1,34 @@
+#! /usr/bin/env python3
+
+import pickle
+
+import numpy as np
+
+from . import spec
+
+def _figure():
+    fig = spec.Figure("4in", "3in", style={'padding': 0})
+    x = np.linspace(0, 1, 50)
+    ax = fig.axes(x_range=(0, 1), y_range=(-1, 1))
+    ax.draw_lines(x, np.sin(6*x))
+    ax.draw_points(x, np.cos(6*x), style={'plot_point_col': 'red'})
+    return fig
+
+def test_figure_pickle(tmp_path):
+    fig = _figure()
+    assert len(fig.ops) == 3
+
+    copy = pickle.loads(fig.dumps())
+    assert len(copy.ops) == 3
+    out = tmp_path / "fig.png"
+    spec.render(copy, str(out))
+    assert out.stat().st_size > 0
+
+def test_figure_share(tmp_path):
+    fig = _figure()
+    with fig.share() as shared:
+        data = shared.dumps()
+        assert len(data) < len(fig.dumps())
+        out = tmp_path / "fig.png"
+        spec.render(data, str(out))
+        assert out.stat().st_size > 0
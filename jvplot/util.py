@@ -135,6 +135,49 @@ def _check_coords(x, y):
     return x, y
 
 
+def _check_series(x, y):
+    """Check the coordinates for one or more polygonal lines.
+
+    Returns flat coordinate arrays `x` and `y`, together with an
+    array `offsets` such that line `k` consists of the vertices
+    ``x[offsets[k]:offsets[k+1]]``, ``y[offsets[k]:offsets[k+1]]``.
+
+    """
+    if y is None:
+        x, y = _check_coords(x, None)
+        return x, y, np.array([0, len(x)])
+
+    if isinstance(y, (list, tuple)) and any(np.ndim(yi) > 0 for yi in y):
+        ys = [np.asarray(yi, dtype=np.float64).reshape(-1) for yi in y]
+        if isinstance(x, (list, tuple)) and any(np.ndim(xi) > 0 for xi in x):
+            xs = [np.asarray(xi, dtype=np.float64).reshape(-1) for xi in x]
+            if len(xs) != len(ys):
+                tmpl = 'x and y have different numbers of lines: %d != %d'
+                raise ValueError(tmpl % (len(xs), len(ys)))
+        else:
+            xs = [np.asarray(x, dtype=np.float64).reshape(-1)] * len(ys)
+        for xi, yi in zip(xs, ys):
+            if len(xi) != len(yi):
+                tmpl = 'x and y have incompatible lengths: %d != %d'
+                raise ValueError(tmpl % (len(xi), len(yi)))
+        offsets = np.zeros(len(ys) + 1, dtype=int)
+        np.cumsum([len(yi) for yi in ys], out=offsets[1:])
+        return np.concatenate(xs), np.concatenate(ys), offsets
+
+    y = np.asarray(y, dtype=np.float64)
+    if len(y.shape) == 2:
+        m, n = y.shape
+        x = np.asarray(x, dtype=np.float64)
+        if x.shape == (n,):
+            x = np.broadcast_to(x, (m, n))
+        if x.shape != (m, n):
+            raise ValueError('x has wrong shape %s' % repr(x.shape))
+        return x.reshape(-1), y.reshape(-1), np.arange(m + 1) * n
+
+    x, y = _check_coords(x, y)
+    return x, y, np.array([0, len(x)])
+
+
 def _check_coord_pair(x, y):
     if y is None:
         x, y = list(x)
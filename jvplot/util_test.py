@@ -11,6 +11,7 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
 
+import numpy as np
 import pytest
 
 from . import util
@@ -37,3 +38,23 @@ def testconvert_dim():
             da = util.convert_dim(a, res, parent_length)
             db = util.convert_dim(b, res, parent_length)
             assert da == pytest.approx(db)
+
+def test_check_series():
+    x, y, offsets = util._check_series([1, 2, 3], None)
+    assert list(y) == [1, 2, 3] and list(offsets) == [0, 3]
+
+    yy = np.arange(6).reshape(2, 3)
+    x, y, offsets = util._check_series([0, 1, 2], yy)
+    assert list(x) == [0, 1, 2, 0, 1, 2]
+    assert list(y) == list(range(6))
+    assert list(offsets) == [0, 3, 6]
+
+    x, y, offsets = util._check_series([[0, 1], [0, 1, 2]],
+                                       [[5, 6], np.array([7, 8, 9])])
+    assert list(x) == [0, 1, 0, 1, 2]
+    assert list(offsets) == [0, 2, 5]
+
+    with pytest.raises(ValueError):
+        util._check_series([0, 1], [[5, 6], [7, 8, 9]])
+    with pytest.raises(ValueError):
+        util._check_series([0, 1], yy)
@@ -0,0 +1,251 @@
+#! /usr/bin/env python3
+
+"""Timing benchmarks for the core drawing operations of jvplot.
+
+Every benchmark draws a figure with a given problem size ``n`` onto
+one of two back-ends: ``rec`` draws onto a Cairo recording surface
+(file name "/dev/null"), ``png`` renders and writes a PNG image.  The
+reported time for each case is the minimum over several repetitions.
+
+Usage:
+
+    tools/benchmark.py run [-k PATTERN]
+    tools/benchmark.py save baseline.json
+    tools/benchmark.py compare baseline.json [--tolerance 0.25]
+
+The ``compare`` command exits with a non-zero status if any case is
+slower than the stored baseline by more than the given fraction.
+Baselines are only meaningful when they have been recorded on the same
+machine.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import os.path
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import jvplot
+from jvplot import layout, scale
+
+
+SIZES = [1000, 10000, 100000]
+
+
+def bench_lines(pl, n, rng):
+    x = np.linspace(0, 1, n)
+    y = np.cumsum(rng.standard_normal(n))
+    ax = pl.axes(x_range=(0, 1), y_range=(np.min(y), np.max(y)))
+    ax.draw_lines(x, y)
+
+def bench_points(pl, n, rng):
+    x = rng.standard_normal(n)
+    y = rng.standard_normal(n)
+    ax = pl.axes(x_range=(-4, 4), y_range=(-4, 4))
+    ax.draw_points(x, y)
+
+def bench_points_raster(pl, n, rng):
+    x = rng.standard_normal(n)
+    y = rng.standard_normal(n)
+    ax = pl.axes(x_range=(-4, 4), y_range=(-4, 4))
+    ax.draw_points(x, y, style={
+        'plot_point_col': 'rgba(0,0,0,.05)',
+        'plot_point_raster': True,
+    })
+
+def bench_rectangle(pl, n, rng):
+    rects = np.empty((n, 4))
+    rects[:, :2] = rng.uniform(0, 1, size=(n, 2))
+    rects[:, 2:] = rng.uniform(0, .01, size=(n, 2))
+    ax = pl.axes(x_range=(0, 1), y_range=(0, 1))
+    ax.draw_rectangle(rects)
+
+def bench_histogram(pl, n, rng):
+    hist = rng.uniform(1, 10, size=n)
+    bin_edges = np.linspace(0, 1, n + 1)
+    ax = pl.axes(x_range=(0, 1), y_range=(0, 10))
+    ax.draw_histogram(hist, bin_edges)
+
+def bench_image(pl, n, rng):
+    k = int(np.sqrt(n))
+    pixels = rng.uniform(0, 1, size=(k, k, 3))
+    ax = pl.axes(x_range=(0, 1), y_range=(0, 1))
+    ax.draw_image(pixels)
+
+def bench_image_rgba(pl, n, rng):
+    k = int(np.sqrt(n))
+    pixels = rng.uniform(0, 1, size=(k, k, 4))
+    ax = pl.axes(x_range=(0, 1), y_range=(0, 1))
+    ax.draw_image(pixels)
+
+def bench_layout(pl, n, rng):
+    # ``n`` is the number of layout problems solved
+    s = scale.Linear()
+    for a, b in rng.uniform(-100, 100, size=(n, 2)):
+        lx = layout.Layout(520, (10, 10), (min(a, b), max(a, b) + 1),
+                           dev_opt_dist=100,
+                           dev_width_fn=lambda s: 5*len(s),
+                           can_shift=True, scale=s)
+        ly = layout.Layout(320, (10, 10), (0, abs(a) + 1),
+                           dev_opt_dist=100,
+                           dev_width_fn=lambda s: 9, scale=s)
+        layout.Layout2D(lx, ly).fix()
+
+def bench_grid_plot(pl, n, rng):
+    # ``n`` is the number of variables
+    z = rng.standard_normal((200, n))
+    rr = [(np.min(z), np.max(z))] * n
+
+    def scatter(pl, row, col, rect, x_range, y_range, style):
+        ax = pl.axes(x_lim=x_range, y_lim=y_range, rect=rect, style=style)
+        ax.draw_points(z[:, col], z[:, row])
+    pl.grid_plot(rr, upper_fn=scatter, lower_fn=scatter)
+
+def bench_demo9(pl, n, rng):
+    # ``n`` is the number of points per panel, see examples/demo9
+    p = 6
+    data = rng.standard_normal((n, p))
+    ranges = np.quantile(data, [.25, .5, .75], axis=0)
+    rr = [np.min(data), np.max(data)]
+
+    def scatter(pl, row, col, rect, x_range, y_range, style):
+        ax = pl.axes(x_lim=x_range, y_lim=y_range, rect=rect, style=style)
+        x_low, _, x_high = ranges[:, col]
+        y_low, _, y_high = ranges[:, row]
+        S = {
+            'rect_bg': 'rgba(255,0,0,.2)',
+            'rect_lw': 0,
+        }
+        ax.draw_rectangle([[None, y_low, None, y_high - y_low],
+                           [x_low, None, x_high - x_low, None]], style=S)
+        ax.draw_rectangle([x_low, y_low, x_high - x_low, y_high - y_low],
+                          style=S)
+        ax.draw_points(data[:, col], data[:, row], style={
+            'plot_point_col': 'rgba(0,0,0,.3)',
+            'plot_point_size': '4pt',
+        })
+        ax.draw_points(data[:, col], data[:, row], style={
+            'plot_point_col': 'black',
+            'plot_point_size': '1pt',
+        })
+
+    def label(pl, row, col, rect, x_range, y_range, style):
+        ax = pl.axes(x_lim=[0, 1], y_lim=[0, 1], rect=rect, style={
+            'axis_border_lw': 0,
+            'axis_ticks': '',
+        })
+        ax.draw_text("V%d" % col, .5, .5,
+                     horizontal_align='center', vertical_align='center')
+
+    pl.grid_plot([rr]*p, upper_fn=scatter, diag_fn=label, lower_fn=scatter,
+                 style={
+                     'axis_ticks': 'BLTR',
+                     'tick_font_size': '6pt',
+                     'margin_bottom': '3mm',
+                     'margin_left': '3mm',
+                     'margin_top': '3mm',
+                     'margin_right': '3mm',
+                 })
+
+
+# name: (function, problem sizes, back-ends)
+CASES = {
+    'lines': (bench_lines, SIZES, ['rec', 'png']),
+    'points': (bench_points, SIZES, ['rec', 'png']),
+    'points_raster': (bench_points_raster, SIZES, ['rec', 'png']),
+    'rectangle': (bench_rectangle, SIZES, ['rec', 'png']),
+    'histogram': (bench_histogram, SIZES, ['rec', 'png']),
+    'image': (bench_image, [10000, 100000, 1000000], ['rec', 'png']),
+    'image_rgba': (bench_image_rgba, [10000, 100000, 1000000], ['rec', 'png']),
+    'layout': (bench_layout, [10, 100], ['rec']),
+    'grid_plot': (bench_grid_plot, [2, 4, 8], ['rec', 'png']),
+    'demo9': (bench_demo9, [100, 1000, 10000], ['rec', 'png']),
+}
+
+
+def time_case(fn, n, backend, repeat, tmp_dir):
+    if backend == 'png':
+        file_name = os.path.join(tmp_dir, 'bench.png')
+    else:
+        file_name = '/dev/null'
+    best = np.inf
+    for i in range(repeat):
+        rng = np.random.default_rng(1)
+        t0 = time.perf_counter()
+        with jvplot.Plot(file_name, "6in", "6in") as pl:
+            fn(pl, n, rng)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def run_all(pattern, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, (fn, sizes, backends) in CASES.items():
+            for backend in backends:
+                for n in sizes:
+                    key = "%s/%s/%d" % (name, backend, n)
+                    if not fnmatch.fnmatch(key, pattern):
+                        continue
+                    t = time_case(fn, n, backend, repeat, tmp_dir)
+                    results[key] = t
+                    print("%-28s %10.4fs" % (key, t), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-k", "--pattern", default="*",
+                        help="only run cases matching this glob pattern")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="number of repetitions per case")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="run the benchmarks and show the timings")
+    p_save = sub.add_parser("save", help="store the timings as a baseline")
+    p_save.add_argument("baseline")
+    p_cmp = sub.add_parser("compare", help="compare against a baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("-t", "--tolerance", type=float, default=0.25,
+                       help="maximal allowed relative slowdown")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as fd:
+            baseline = json.load(fd)["results"]
+
+    results = run_all(args.pattern, args.repeat)
+
+    if args.command == "save":
+        with open(args.baseline, "w") as fd:
+            json.dump({
+                "jvplot": jvplot.__version__,
+                "python": platform.python_version(),
+                "machine": platform.node(),
+                "results": results,
+            }, fd, indent=2, sort_keys=True)
+    elif args.command == "compare":
+        failed = []
+        print()
+        for key, t in results.items():
+            if key not in baseline:
+                continue
+            ratio = t / baseline[key]
+            mark = ""
+            if ratio > 1 + args.tolerance:
+                mark = "SLOWER"
+                failed.append(key)
+            print("%-28s %10.4fs %10.4fs %6.2f %s" % (
+                key, baseline[key], t, ratio, mark))
+        if failed:
+            print("\n%d case(s) slower than the baseline by more than %.0f%%"
+                  % (len(failed), 100 * args.tolerance))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()